@@ -1,2 +1,6 @@
 from augmentation.augment import Augmentation
 
+from augmentation.strategies import register_strategy, get_strategy_names
+from augmentation.sinks import MemorySink
+from augmentation.result_cache import ResultCache
+from augmentation.sweep import Sweep
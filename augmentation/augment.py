@@ -1,10 +1,55 @@
+import itertools
 import math
+import multiprocessing
 import random
-from typing import Set
+import time
+from collections import deque
+from contextlib import nullcontext
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, Iterator, List
 
-from dataset import Dataset, Mappings
-from augmentation.character_augmentation import SimpleCharacterBasedAugmentation
-from augmentation.segment_augmentation import SimpleSegmentBasedAugmentation
+from dataset import Corpus
+from augmentation.dedup import build_dedup_filter
+from augmentation.random_state import get_content_rng, get_sample_rng
+from augmentation.result_cache import ResultCache, hash_sample
+from augmentation.sinks import CountingSink, MemorySink
+from augmentation.strategies import SampleContext, apply_strategy_chain, get_strategy_chain
+from utils.metrics import Metrics
+
+_worker_augmentation = None  # Augmentation instance of the current worker process
+
+
+def _init_worker(augmentation):
+    """
+    Store augmentation instance in worker process. With fork, the instance (and its corpus) is inherited, not pickled.
+    """
+    global _worker_augmentation
+    _worker_augmentation = augmentation
+    augmentation.corpus.mappings.similarity_cache.reconnect()
+    if augmentation.result_cache is not None:
+        augmentation.result_cache.reconnect()
+
+
+def is_new_sequence(tokens: List[str], already_exists: set):
+    """
+    Check tokens sequence against the hashed sequences seen so far and remember it
+    :return: True if the sequence was not seen before
+    """
+    key = tuple(tokens)
+    if key in already_exists:
+        return False
+    already_exists.add(key)
+    return True
+
+
+def _augment_chunk(strategies: List[str], chunk: List[tuple]):
+    """
+    Augment a chunk of (sample index, sample) tuples in a worker process
+    :return: Augmented samples of each strategy for each sample in the chunk and metrics of the chunk
+    """
+    _worker_augmentation.metrics = Metrics()
+    results = _worker_augmentation.augment_chunk(chunk, strategies)
+    return results, _worker_augmentation.metrics.to_dict()
 
 
 class Augmentation:
@@ -13,178 +58,367 @@ class Augmentation:
     """
 
     def __init__(self,
-                 input_path: str,
-                 word_column: int,
-                 tag_columns: Set[int] | int,
-                 main_entity_column: int = None,
+                 corpus: Corpus,
                  sample_ratio: float = 0.1,
                  p_augmentation: float = 0.5,
                  n_iteration: int = 1,
                  seed: int = 42,
+                 n_similarities: int = 5,
+                 weighted_replacement: bool = False,
+                 workers: int = 1,
+                 chunk_size: int = 256,
+                 dedup: str = None,
+                 dedup_error_rate: float = 1e-6,
+                 result_cache_path: str = None,
                  ):
         """
-        :param input_path: Path to input file
-        :param word_column: Index for word column
-        :param tag_columns: Indices for tag columns
-        :param main_entity_column: Index of main entity column for multi-columns tagging. Default: 1
+        :param corpus: Parsed corpus shared across augmentation runs
         :param sample_ratio: Ratio to retrieve sample amount of annotated entity sequences
         :param p_augmentation: Probability to randomly decide whether the given segment should be augmented
         :param n_iteration: Number of augmentation rounds
         :param seed: Random seed
+        :param n_similarities: Number of most similar tokens to choose from for similarity-based replacements
+        :param weighted_replacement: Whether label-wise replacements are drawn proportional to token frequency
+        :param workers: Number of worker processes. Output doesn't depend on the number of workers
+        :param chunk_size: Number of samples augmented at once, in a batch and per worker task
+        :param dedup: Drop augmented samples identical to any original or previously augmented sentence of the corpus.
+        "hash" keeps an exact set of 64 bit hashes, "bloom" a memory-bounded Bloom filter. Default: per-sample only
+        :param dedup_error_rate: Rate of unique samples the Bloom filter drops by mistake
+        :param result_cache_path: Path to sqlite file caching augmented samples by sentence content across runs, so
+        only new or changed sentences are augmented again. Random generators are then derived from the content of
+        each sample instead of its index
         """
-        self.tag_columns = {tag_columns} if int == type(tag_columns) else tag_columns
-        self.main_entity_column = 1 if main_entity_column is None else main_entity_column
-        self.dataset = Dataset(input_path, word_column, *self.tag_columns)
-        self.all_sequences = self.dataset.read_tsv_to_list()
-        self.entity_sequences = [sequence for sequence in self.dataset.get_entity_sequence()]
-        self.labels_to_tokens_mapping = Mappings(self.all_sequences).map_labels_to_tokens(self.main_entity_column)
+        self.corpus = corpus
+        self.tag_columns = corpus.tag_columns
+        self.main_entity_column = corpus.main_entity_column
+        self.entity_sequences = corpus.entity_sequences
+        self.labels_to_tokens_mapping = corpus.labels_to_tokens_mapping
+        self.label_token_index = corpus.label_token_index
         self.sample_ratio = sample_ratio
         self.p_augmentation = p_augmentation
         self.n_iteration = n_iteration
         self.n_samples = math.floor(self.sample_ratio * len(self.entity_sequences))
         self.seed = seed
-        self.augmentation_samples = []
+        self.n_similarities = n_similarities
+        self.weighted_replacement = weighted_replacement
+        self.workers = workers
+        self.chunk_size = chunk_size
+        self.sinks = {}  # Output sink of each strategy
+        self.dedup = dedup
+        self.dedup_error_rate = dedup_error_rate
+        self.dedup_filters = {}
+        self.n_duplicates = {}  # Number of augmented samples of each strategy dropped by corpus-wide dedup
+        self.metrics = Metrics()  # Wall time per stage and strategy, sample and duplicate counters
+        self.result_cache = ResultCache(result_cache_path) if result_cache_path is not None else None
+        self.profiler = None  # Profiler of the run, which then profiles each strategy as a separate part
 
     def word_based_augmentation(self, strategy: str = "swap_first_last"):
         """
         :param strategy: Augmentation strategy
         """
-        for sample in self.get_samples():
-            augment = SimpleSegmentBasedAugmentation(sequence=sample[0], labels=sample[self.main_entity_column])
-            already_exists = [sample[0]]
-            current_iteration = 0  # Determine current augmentation round
-            while current_iteration < self.n_iteration:
-                if strategy == "swap_first_last":
-                    augmented = augment.random_swap_first_last_segment_tokens(p=self.p_augmentation)
-                    if augmented not in already_exists:
-                        already_exists.append(augmented)
-                        self.augmentation_samples.append([augmented] + sample[1:])
-
-                if strategy == "remove_left_neighbor":
-                    tmp_augmentation = []
-                    augmented, labels, pos_ids = augment.random_remove_entity_neighbor(p=self.p_augmentation,
-                                                                                       return_pos_ids=True
-                                                                                       )
-                    if augmented not in already_exists:
-                        already_exists.append(augmented)
-                        if len(list(self.tag_columns)) > 1:
-                            tmp_augmentation.extend([augmented, labels])
-                            tags = []  # Adjust tags for other columns if multi-columns
-                            for i in range(1, len(sample)):
-                                if i != self.main_entity_column:
-                                    for j, _ in enumerate(sample[i]):
-                                        if j not in pos_ids:
-                                            tags.append(sample[i][j])
-                                    tmp_augmentation.insert(i, tags)
-                                    tags = []
-                            self.augmentation_samples.append(tmp_augmentation)
-                        else:
-                            self.augmentation_samples.append([augmented, labels])
-
-                if strategy == "remove_right_neighbor":
-                    tmp_augmentation = []
-                    augmented, labels, pos_ids = augment.random_remove_entity_neighbor(left=False,
-                                                                                       right=True,
-                                                                                       p=self.p_augmentation,
-                                                                                       return_pos_ids=True
-                                                                                       )
-                    if augmented not in already_exists:
-                        already_exists.append(augmented)
-                        if len(list(self.tag_columns)) > 1:
-                            tmp_augmentation.extend([augmented, labels])
-                            tags = []
-                            for i in range(1, len(sample)):
-                                if i != self.main_entity_column:
-                                    for j, _ in enumerate(sample[1]):
-                                        if j not in pos_ids:
-                                            tags.append(sample[i][j])
-                                    tmp_augmentation.insert(i, tags)
-                                    tags = []
-                            self.augmentation_samples.append(tmp_augmentation)
-                        else:
-                            self.augmentation_samples.append([augmented, labels])
-
-                if strategy == "remove_surrounding_neighbors":
-                    tmp_augmentation = []
-                    perturbed, labels, pos_ids = augment.random_remove_entity_neighbor(p=self.p_augmentation,
-                                                                                       left=True,
-                                                                                       right=True,
-                                                                                       return_pos_ids=True)
-                    if perturbed not in already_exists:
-                        already_exists.append(perturbed)
-                        if len(list(self.tag_columns)) > 1:
-                            tmp_augmentation.extend([perturbed, labels])
-                            tags = []  # Adjust tags for other columns if multi-columns
-                            for i in range(1, len(sample)):
-                                if i != self.main_entity_column:
-                                    for j, _ in enumerate(sample[i]):
-                                        if j not in pos_ids:
-                                            tags.append(sample[i][j])
-                                    tmp_augmentation.insert(i, tags)
-                                    tags = []
-                            self.augmentation_samples.append(tmp_augmentation)
-                        else:
-                            self.augmentation_samples.extend([perturbed, labels])
-
-                if strategy == "label_wise_replacement":
-                    augmented = augment.label_wise_token_replacement(
-                        labels_to_tokens_map=self.labels_to_tokens_mapping,
-                        p=self.p_augmentation
-                    )
-                    if augmented not in already_exists:
-                        already_exists.append(augmented)
-                        self.augmentation_samples.append([augmented] + sample[1:])
-
-                if strategy == "shuffle_in_entity":
-                    augmented = augment.shuffle_within_entity_segment(p=self.p_augmentation)
-                    if augmented not in already_exists:
-                        already_exists.append(augmented)
-                        self.augmentation_samples.append([augmented] + sample[1:])
-
-                if strategy == "shuffle_in_segments":
-                    augmented = augment.shuffle_within_segments(p=self.p_augmentation)
-                    if augmented not in already_exists:
-                        already_exists.append(augmented)
-                        self.augmentation_samples.append([augmented] + sample[1:])
-                current_iteration += 1
+        self.run([strategy])
 
     def character_based_augmentation(self, strategy: str = "reverse_letter_case"):
         """
         :param strategy: Augmentation strategy
         """
-        for sample in self.get_samples():
-            augment = SimpleCharacterBasedAugmentation(sequence=sample[0], labels=sample[1])
-            already_exists = sample[0]
-            current_iteration = 0
-            while current_iteration < self.n_iteration:
-                if strategy == "reverse_letter_case":
-                    augmented = augment.random_reverse_letter_case(p=self.p_augmentation)
-                    if augmented not in already_exists:
-                        already_exists.append(augmented)
-                        self.augmentation_samples.append([augmented] + sample[1:])
-
-                if strategy == "delete_character":
-                    augmented = augment.random_delete_character(p=self.p_augmentation)
-                    if augmented not in already_exists:
-                        already_exists.append(augmented)
-                        self.augmentation_samples.append([augmented] + sample[1:])
-
-                if strategy == "shuffle_characters_in_token":
-                    augmented = augment.random_shuffle_chars_in_token(p=self.p_augmentation)
-                    if augmented not in already_exists:
-                        already_exists.append(augmented)
-                        self.augmentation_samples.append([augmented] + sample[1:])
-                current_iteration += 1
-
-    def get_sizes(self):
+        self.run([strategy])
+
+    def iter_word_based_augmentation(self, strategy: str = "swap_first_last"):
+        """
+        Streaming variant of word_based_augmentation. Counts remain available for get_sizes.
+        :param strategy: Augmentation strategy
+        :return: Generator of augmented samples
+        """
+        for _, augmented_sample in self.iter_run([strategy]):
+            yield augmented_sample
+
+    def iter_character_based_augmentation(self, strategy: str = "reverse_letter_case"):
+        """
+        Streaming variant of character_based_augmentation. Counts remain available for get_sizes.
+        :param strategy: Augmentation strategy
+        :return: Generator of augmented samples
+        """
+        for _, augmented_sample in self.iter_run([strategy]):
+            yield augmented_sample
+
+    def run(self, strategies: List[str], sinks: Dict[str, CountingSink] = None):
+        """
+        Apply several strategies in a single pass over the sampled sentences. Each sentence is segmented once and
+        every strategy works on the cached segmentation. Results are identical to separate runs of each strategy.
+        :param strategies: Strategy names or compositions of strategies joined by "+"
+        :param sinks: Output sink of each strategy, e.g. WriterSink to stream results to files. Default: MemorySink
+        """
+        self.prepare(strategies, sinks)
+        try:
+            for results in self.iter_augmented_samples(strategies):
+                start = time.perf_counter()
+                for strategy, augmented_samples in zip(strategies, results):
+                    self.sinks[strategy].add(augmented_samples)
+                self.metrics.add_time("write", time.perf_counter() - start)
+        finally:
+            with self.metrics.stage("write"):
+                for strategy in strategies:
+                    self.sinks[strategy].close()
+
+    def iter_run(self, strategies: List[str]):
+        """
+        Streaming variant of run, keeping counts of augmented samples only
+        :param strategies: Strategy names or compositions of strategies joined by "+"
+        :return: Generator of (strategy, augmented sample) tuples in sample order
+        """
+        self.prepare(strategies, {strategy: CountingSink() for strategy in strategies})
+        for results in self.iter_augmented_samples(strategies):
+            for strategy, augmented_samples in zip(strategies, results):
+                self.sinks[strategy].add(augmented_samples)
+                for augmented_sample in augmented_samples:
+                    yield strategy, augmented_sample
+
+    def prepare(self, strategies: List[str], sinks: Dict[str, CountingSink] = None):
+        """
+        Set up sinks and dedup filters of strategies
+        :param strategies: Strategy names or compositions of strategies joined by "+"
+        :param sinks: Output sink of each strategy. Default: MemorySink
+        """
+        for strategy in strategies:
+            get_strategy_chain(strategy)  # Fail early on unknown strategies
+            self.sinks[strategy] = MemorySink() if sinks is None or strategy not in sinks else sinks[strategy]
+            self.n_duplicates[strategy] = 0
+            if self.dedup is not None:
+                with self.metrics.stage("dedup"):
+                    self.dedup_filters[strategy] = build_dedup_filter(self.dedup,
+                                                                      self.corpus.all_sequences,
+                                                                      capacity=len(self.corpus) +
+                                                                      self.n_samples * self.n_iteration,
+                                                                      error_rate=self.dedup_error_rate)
+
+    def augment_sample(self, sample_index: int, sample: List[List[str]], strategies: List[str]):
+        """
+        Apply augmentation strategies to a single sample
+        :param sample_index: Index of sample, used to derive its random generators
+        :param sample: Sample as [[tokens], [tags_col_1], ...]
+        :param strategies: Strategy names or compositions of strategies joined by "+"
+        :return: List of augmented samples of each strategy
+        """
+        return self.augment_chunk([(sample_index, sample)], strategies)[0]
+
+    def augment_chunk(self, chunk: List[tuple], strategies: List[str]):
+        """
+        Apply augmentation strategies to a chunk of samples. Strategies with a batch version process the whole chunk at
+        once, the others run sample by sample. Every sample draws from its own random generators, so results don't
+        depend on how samples are chunked. With a result cache, only samples missing from the cache are augmented.
+        :param chunk: List of (sample index, sample) tuples
+        :param strategies: Strategy names or compositions of strategies joined by "+"
+        :return: List of augmented samples of each strategy, one item for each sample
+        """
+        content_hashes = None
+        if self.result_cache is not None:
+            content_hashes = [hash_sample(sample) for _, sample in chunk]
+        contexts = [None] * len(chunk)  # Created on first use and shared by all strategies
+        results = [[] for _ in chunk]
+        for strategy in strategies:
+            with self.profile_part(f"strategy:{strategy}"):
+                if self.result_cache is None:
+                    augmented_samples = self.augment_strategy(chunk, strategy, contexts)
+                else:
+                    start = time.perf_counter()
+                    keys = ResultCache.get_keys(content_hashes, strategy, self.get_cache_params())
+                    augmented_samples = self.result_cache.get_many(keys)
+                    missing = [i for i, cached in enumerate(augmented_samples) if cached is None]
+                    self.metrics.add_time("cache", time.perf_counter() - start)
+                    if missing:
+                        missing_contexts = [contexts[i] for i in missing]
+                        computed = self.augment_strategy([chunk[i] for i in missing], strategy, missing_contexts,
+                                                         [content_hashes[i] for i in missing])
+                        start = time.perf_counter()
+                        for i, sample_augmented, context in zip(missing, computed, missing_contexts):
+                            augmented_samples[i] = sample_augmented
+                            contexts[i] = context
+                        self.result_cache.put_many([keys[i] for i in missing], computed)
+                        self.metrics.add_time("cache", time.perf_counter() - start)
+                    self.metrics.count(f"cache_hits:{strategy}", len(chunk) - len(missing))
+                    self.metrics.count(f"cache_misses:{strategy}", len(missing))
+                for sample_results, sample_augmented in zip(results, augmented_samples):
+                    sample_results.append(sample_augmented)
+                n_generated = self.n_iteration * len(chunk)
+                self.metrics.count(f"generated:{strategy}", n_generated)
+                self.metrics.count(f"sample_duplicates:{strategy}",
+                                   n_generated - sum(map(len, augmented_samples)))
+        return results
+
+    def augment_strategy(self, chunk: List[tuple], strategy: str, contexts: List[SampleContext],
+                         content_hashes: List[bytes] = None):
+        """
+        Apply one strategy to a chunk of samples
+        :param chunk: List of (sample index, sample) tuples
+        :param strategy: Strategy name or composition of strategies joined by "+"
+        :param contexts: Context of each sample, None where not created yet. Missing contexts are filled in if needed
+        :param content_hashes: Content hash of each sample to derive its random generator from. Default: sample index
+        :return: Augmented samples of each sample
+        """
+        samples = [sample for _, sample in chunk]
+        chain = get_strategy_chain(strategy)
+        batch_function = chain[0].batch_function if len(chain) == 1 else None
+        if batch_function is None and None in contexts:
+            with self.metrics.stage("segmentation"):
+                for i, sample in enumerate(samples):
+                    if contexts[i] is None:
+                        contexts[i] = SampleContext(sample, self.main_entity_column)
+        start = time.perf_counter()
+        # Every strategy draws from its own generators, so it doesn't matter which strategies run together
+        if content_hashes is None:
+            rngs = [get_sample_rng(self.seed, sample_index) for sample_index, _ in chunk]
+        else:
+            rngs = [get_content_rng(self.seed, content_hash) for content_hash in content_hashes]
+        augmented_samples = [[] for _ in chunk]
+        already_exists = [{tuple(sample[0])} for sample in samples]
+        if batch_function is not None:
+            for _ in range(self.n_iteration):
+                for i, augmented in enumerate(batch_function(self, samples, rngs)):
+                    if is_new_sequence(augmented[0], already_exists[i]):
+                        augmented_samples[i].append(augmented)
+        else:
+            for i, (sample, context, rng) in enumerate(zip(samples, contexts, rngs)):
+                for _ in range(self.n_iteration):
+                    augmented = apply_strategy_chain(self, sample, chain, rng, context=context)
+                    if is_new_sequence(augmented[0], already_exists[i]):
+                        augmented_samples[i].append(augmented)
+        self.metrics.add_time(f"strategy:{strategy}", time.perf_counter() - start)
+        return augmented_samples
+
+    def get_cache_params(self):
+        """
+        :return: Parameters augmented samples depend on besides sample content, strategy and code version
+        """
+        return {"p_augmentation": self.p_augmentation,
+                "n_iteration": self.n_iteration,
+                "seed": self.seed,
+                "n_similarities": self.n_similarities,
+                "weighted_replacement": self.weighted_replacement,
+                "main_entity_column": self.main_entity_column,
+                "tag_columns": list(self.tag_columns),
+                # spaCy model and approximate search settings of similarity-based replacements
+                "similarity_model": self.corpus.mappings.cache_model_key}
+
+    def get_chunk(self, samples: Iterator[tuple]):
+        """
+        :param samples: Iterator of (sample index, sample) tuples
+        :return: List of the next chunk_size (sample index, sample) tuples
+        """
+        with self.metrics.stage("sampling"):
+            return list(itertools.islice(samples, self.chunk_size))
+
+    def profile_part(self, name: str):
+        """
+        :return: Context manager profiling the with-block as the given part, if a profiler is set
+        """
+        return nullcontext() if self.profiler is None else self.profiler.part(name)
+
+    def run_samples(self, strategies: List[str]):
+        """
+        Apply strategies to all samples, either serially or sharded across a process pool.
+        Each sample has its own random generators, and results are merged in sample order, so output is identical
+        regardless of the number of workers.
+        :param strategies: Strategy names or compositions of strategies joined by "+"
+        :return: Generator of augmented samples of each strategy, one item for each sample
         """
+        samples = enumerate(self.get_samples())
+        if self.workers <= 1:
+            while chunk := self.get_chunk(samples):
+                yield from self.augment_chunk(chunk, strategies)
+            return
+
+        context = multiprocessing.get_context("fork" if "fork" in multiprocessing.get_all_start_methods() else None)
+        with ProcessPoolExecutor(max_workers=self.workers,
+                                 mp_context=context,
+                                 initializer=_init_worker,
+                                 initargs=(self,)) as executor:
+            # Keep a bounded number of chunks in flight, so memory doesn't grow with the number of samples
+            pending = deque()
+            while True:
+                chunk = self.get_chunk(samples)
+                if chunk:
+                    pending.append(executor.submit(_augment_chunk, strategies, chunk))
+                if pending and (not chunk or len(pending) >= 2 * self.workers):
+                    chunk_results, chunk_metrics = pending.popleft().result()
+                    self.metrics.merge(chunk_metrics)
+                    yield from chunk_results
+                elif not chunk:
+                    return
+
+    def iter_augmented_samples(self, strategies: List[str]):
+        """
+        Corpus-wide dedup is applied here in sample order, so results don't depend on the number of workers.
+        :param strategies: Strategy names
+        :return: Generator of deduplicated augmented samples of each strategy, one item for each sample
+        """
+        for results in self.run_samples(strategies):
+            self.metrics.count("samples")
+            if self.dedup_filters:
+                start = time.perf_counter()
+                for i, (strategy, augmented_samples) in enumerate(zip(strategies, results)):
+                    dedup_filter = self.dedup_filters.get(strategy)
+                    if dedup_filter is not None:
+                        results[i] = [augmented_sample for augmented_sample in augmented_samples
+                                      if dedup_filter.add(augmented_sample[0])]
+                        self.n_duplicates[strategy] += len(augmented_samples) - len(results[i])
+                        self.metrics.count(f"corpus_duplicates:{strategy}", len(augmented_samples) - len(results[i]))
+                self.metrics.add_time("dedup", time.perf_counter() - start)
+            yield results
+
+    def get_sink(self, strategy: str = None):
+        """
+        :param strategy: Strategy name. May be omitted if a single strategy was run
+        :return: Output sink of the strategy
+        """
+        if strategy is None:
+            if not self.sinks:
+                return MemorySink()
+            if len(self.sinks) > 1:
+                raise ValueError(f"Several strategies were run, choose one of {', '.join(self.sinks)}")
+            strategy = next(iter(self.sinks))
+        return self.sinks[strategy]
+
+    @property
+    def augmentation_samples(self):
+        return self.get_augmentation_samples()
+
+    def get_sizes(self, sample_ratio: float = None, strategy: str = None):
+        """
+        :param sample_ratio: Report sizes for the samples of a smaller sample ratio. Since samples of a smaller ratio
+        are a prefix of the samples of a larger one, a single run at the largest ratio covers all smaller ratios.
+        :param strategy: Strategy name. May be omitted if a single strategy was run
         :return: N sentences in dataset, N entity sentences, N samples and N augmented instances
         """
-        return len(self.dataset), len(self.entity_sequences), self.n_samples, len(self.augmentation_samples)
+        sink = self.get_sink(strategy)
+        if sample_ratio is None:
+            return len(self.corpus), len(self.entity_sequences), self.n_samples, sink.get_n_augmented()
+        n_samples = math.floor(sample_ratio * len(self.entity_sequences))
+        if n_samples > self.n_samples:
+            raise ValueError(f"Sample ratio {sample_ratio} exceeds augmented sample ratio {self.sample_ratio}")
+        return len(self.corpus), len(self.entity_sequences), n_samples, sink.get_n_augmented(n_samples)
+
+    def get_augmentation_samples(self, sample_ratio: float = None, strategy: str = None):
+        """
+        :param sample_ratio: Return augmented samples of a smaller sample ratio only
+        :param strategy: Strategy name. May be omitted if a single strategy was run
+        :return: List of augmented samples
+        """
+        sink = self.get_sink(strategy)
+        if not isinstance(sink, MemorySink):
+            raise ValueError("Augmented samples were streamed and are not kept in memory")
+        return sink.samples[:self.get_sizes(sample_ratio, strategy)[3]]
+
+    def get_permutation(self):
+        """
+        Seeded random permutation of the indices of annotated sentences
+        """
+        return random.Random(self.seed).sample(range(len(self.entity_sequences)), k=len(self.entity_sequences))
 
     def get_samples(self):
         """
-        Random sample and generate N annotated sentences from dataset based on sample ratio
+        Random sample and generate N annotated sentences from dataset based on sample ratio.
+        Samples are a prefix of a seeded permutation, so samples of smaller ratios are nested in those of larger ones.
         """
-        random.seed(self.seed)
-        yield from random.sample(self.entity_sequences, k=self.n_samples)
+        for index in self.get_permutation()[:self.n_samples]:
+            yield self.entity_sequences[index]
@@ -1 +1,2 @@
+from augmentation.character_augmentation.character_noise import CharacterNoise
 from augmentation.character_augmentation.simple_character_based_augmentation import SimpleCharacterBasedAugmentation
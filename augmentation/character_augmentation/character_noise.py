@@ -0,0 +1,105 @@
+import itertools
+from typing import List
+
+import numpy as np
+
+
+class CharacterNoise:
+    """
+    Character-level noise applied to a whole batch of sentences at once. Per-token decisions, character positions and
+    shuffle keys are drawn as arrays for the batch, so Python work is limited to slicing the selected tokens.
+    Every sentence draws from its own random generator, in the same order in single-sentence and batch mode, so the
+    result of a sentence doesn't depend on the batch it is processed in.
+    """
+
+    def __init__(self, p: float = 0.5):
+        """
+        :param p: Probability of a token to be augmented. Also determines the position of the edited character
+        """
+        self.p = p
+
+    def select_tokens(self, sentences: List[List[str]], rngs: List[np.random.Generator], min_length: int):
+        """
+        Draw one decision for each token of each sentence
+        :param sentences: List of sentences as lists of tokens
+        :param rngs: Random generator of each sentence
+        :param min_length: Minimal number of characters of selected tokens
+        :return: Flat list of tokens, sentence offsets into it, indices of selected tokens and their lengths
+        """
+        tokens = [token for sentence in sentences for token in sentence]
+        offsets = list(itertools.accumulate(map(len, sentences), initial=0))
+        draws = [rng.random(len(sentence)) for sentence, rng in zip(sentences, rngs)]
+        decisions = draws[0] if len(draws) == 1 else np.concatenate(draws) if draws else np.empty(0)
+        lengths = np.fromiter(map(len, tokens), dtype=np.int64, count=len(tokens))
+        selected = ((decisions < self.p) & (lengths >= min_length)).nonzero()[0]
+        return tokens, offsets, selected, lengths[selected]
+
+    def get_positions(self, lengths: np.ndarray):
+        """
+        :param lengths: Lengths of selected tokens
+        :return: Index of the edited character of each token
+        """
+        return np.floor(self.p * (lengths - 1)).astype(np.int64)
+
+    @staticmethod
+    def split(tokens: List[str], offsets: List[int]):
+        """
+        :return: Flat list of tokens split back into sentences
+        """
+        return [tokens[start:end] for start, end in zip(offsets, offsets[1:])]
+
+    def reverse_letter_case(self, sentences: List[List[str]], rngs: List[np.random.Generator]):
+        """
+        Reverse the case of one letter of randomly selected tokens of 3 characters or more
+        :param sentences: List of sentences as lists of tokens
+        :param rngs: Random generator of each sentence
+        :return: List of augmented sentences
+        """
+        tokens, offsets, selected, lengths = self.select_tokens(sentences, rngs, min_length=3)
+        for index, position in zip(selected.tolist(), self.get_positions(lengths).tolist()):
+            token = tokens[index]
+            char = token[position]
+            tokens[index] = token[:position] + (char.upper() if char.islower() else char.lower()) + token[position + 1:]
+        return self.split(tokens, offsets)
+
+    def delete_character(self, sentences: List[List[str]], rngs: List[np.random.Generator]):
+        """
+        Delete one character of randomly selected tokens of 2 characters or more
+        :param sentences: List of sentences as lists of tokens
+        :param rngs: Random generator of each sentence
+        :return: List of augmented sentences
+        """
+        tokens, offsets, selected, lengths = self.select_tokens(sentences, rngs, min_length=2)
+        for index, position in zip(selected.tolist(), self.get_positions(lengths).tolist()):
+            token = tokens[index]
+            tokens[index] = token[:position] + token[position + 1:]
+        return self.split(tokens, offsets)
+
+    def shuffle_characters(self, sentences: List[List[str]], rngs: List[np.random.Generator]):
+        """
+        Shuffle characters of randomly selected tokens of 3 characters or more. Characters of all selected tokens are
+        permuted at once, by sorting random keys within each token.
+        :param sentences: List of sentences as lists of tokens
+        :param rngs: Random generator of each sentence
+        :return: List of augmented sentences
+        """
+        tokens, offsets, selected, lengths = self.select_tokens(sentences, rngs, min_length=3)
+        if not len(selected):
+            return self.split(tokens, offsets)
+        indices = selected.tolist()
+        # Each sentence draws keys for the characters of its own selected tokens
+        if len(sentences) == 1:
+            keys = rngs[0].random(int(lengths.sum()))
+        else:
+            sentence_ids = np.searchsorted(offsets, selected, side="right") - 1
+            n_chars = np.bincount(sentence_ids, weights=lengths, minlength=len(sentences)).astype(np.int64).tolist()
+            keys = np.concatenate([rng.random(n) for rng, n in zip(rngs, n_chars)])
+        token_ids = np.repeat(np.arange(len(indices)), lengths)
+        chars = np.frombuffer("".join([tokens[index] for index in indices]).encode("utf-32-le", "surrogatepass"),
+                              dtype=np.uint32)
+        shuffled = chars[np.lexsort((keys, token_ids))].tobytes().decode("utf-32-le", "surrogatepass")
+        bounds = list(itertools.accumulate(lengths.tolist(), initial=0))
+        for index, start, end in zip(indices, bounds, bounds[1:]):
+            tokens[index] = shuffled[start:end]
+        return self.split(tokens, offsets)
+
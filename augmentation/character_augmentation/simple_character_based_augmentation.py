@@ -1,70 +1,47 @@
-from dataset import SequenceSegmentation
+from augmentation.character_augmentation.character_noise import CharacterNoise
+from augmentation.random_state import check_random_state
+from dataset import SequenceSegmentation, Spans
 from typing import List
 
 import numpy as np
-import random
-import math
 
 
 class SimpleCharacterBasedAugmentation(SequenceSegmentation):
-    def __init__(self, sequence: List[str], labels: List[str]):
-        super().__init__(sequence=sequence, labels=labels)
+    def __init__(self, sequence: List[str], labels: List[str], spans: Spans = None):
+        super().__init__(sequence=sequence, labels=labels, spans=spans)
 
-    def random_reverse_letter_case(self, p: float = 0.5, seed: int = 0):
+    def random_reverse_letter_case(self, p: float = 0.5, seed: int = 0, rng: np.random.Generator = None):
         """
         Randomly reversing the case of a letter. I.e.: lower -> upper  and upper -> lower
         :param p: Random probability
-        :param seed: Random seed
+        :param seed: Random seed, used if no random generator is given
+        :param rng: Random generator
         :return: List of tokens containing reversed letters cases
         """
-        sequence = []
-        for token in self.get_tokens_from_segments():
-            # ignore punctuations
-            # np.random.seed(seed)
-            if np.random.binomial(1, p, 1)[0] == 1 and len(token) > 2:
-                letter_id = math.floor(p * (len(token) - 1))  # select letter for case reversion
-                letters = list(token)
-                letters[letter_id] = letters[letter_id].upper() if letters[letter_id].islower() else letters[letter_id].lower()
-                token = "".join(letters)
-            sequence.append(token)
-        return sequence
+        rng = check_random_state(rng, seed)
+        return CharacterNoise(p).reverse_letter_case([list(self.get_tokens_from_segments())], [rng])[0]
 
-    def random_delete_character(self, p: float = 0.5, seed: int = 0):
+    def random_delete_character(self, p: float = 0.5, seed: int = 0, rng: np.random.Generator = None):
         """
         Random delete a character / letter from token.
         :param p: Random probability
-        :param seed: Random seed
+        :param seed: Random seed, used if no random generator is given
+        :param rng: Random generator
         :return: List of tokens with omitted characters
         """
-        sequence = []
-        for token in self.get_tokens_from_segments():
-            # Length of current token should be at least 2
-            # np.random.seed(seed)
-            if np.random.binomial(1, p, 1)[0] == 1 and len(token) > 1:
-                char_id = math.floor(p * (len(token) - 1))
-                chars = list(token)
-                chars.pop(char_id)
-                token = "".join(chars)
-            sequence.append(token)
-        return sequence
+        rng = check_random_state(rng, seed)
+        return CharacterNoise(p).delete_character([list(self.get_tokens_from_segments())], [rng])[0]
 
-    def random_shuffle_chars_in_token(self, p: float = 0.5, seed: int = 0):
+    def random_shuffle_chars_in_token(self, p: float = 0.5, seed: int = 0, rng: np.random.Generator = None):
         """
         Random shuffle given token with a length of 2 characters or more.
         :param p: Random probability
-        :param seed: Seed for randomisation
+        :param seed: Seed for randomisation, used if no random generator is given
+        :param rng: Random generator
         :return: List of sequence with shuffled tokens
         """
-        sequence = []
-        for token in self.get_tokens_from_segments():
-            # np.random.seed(seed)
-            if np.random.binomial(1, p, 1)[0] == 1 and len(token) > 2:
-                chars = list(token)
-                random.seed(seed)
-                random.shuffle(chars)
-                token = "".join(chars)
-            sequence.append(token)
-        return sequence
+        rng = check_random_state(rng, seed)
+        return CharacterNoise(p).shuffle_characters([list(self.get_tokens_from_segments())], [rng])[0]
 
     def get_tokens_from_segments(self):
         for segment in self.get_tags_based_segments():
@@ -0,0 +1,98 @@
+import hashlib
+import math
+from typing import Iterable, List
+
+import numpy as np
+
+
+def hash_sequence(tokens: List[str]):
+    """
+    :param tokens: Tokens sequence
+    :return: 128 bit hash of the sequence as two unsigned 64 bit integers
+    """
+    digest = hashlib.blake2b("\x1f".join(tokens).encode("utf-8"), digest_size=16).digest()
+    return int.from_bytes(digest[:8], "little"), int.from_bytes(digest[8:], "little")
+
+
+class HashFilter:
+    """
+    Exact set of 64 bit sequence hashes. Collisions are negligible below billions of sequences.
+    """
+
+    def __init__(self):
+        self.hashes = set()
+
+    def __len__(self):
+        return len(self.hashes)
+
+    def add(self, tokens: List[str]):
+        """
+        :return: True if the sequence was not seen before
+        """
+        key = hash_sequence(tokens)[0]
+        if key in self.hashes:
+            return False
+        self.hashes.add(key)
+        return True
+
+
+class BloomFilter:
+    """
+    Memory-bounded Bloom filter over sequence hashes. A new sequence is reported as seen with a probability of at
+    most error_rate as long as no more than capacity sequences were added; seen sequences are always detected.
+    """
+
+    def __init__(self, capacity: int, error_rate: float = 1e-6):
+        """
+        :param capacity: Expected number of sequences
+        :param error_rate: False positive rate at capacity
+        """
+        capacity = max(capacity, 1)
+        self.n_bits = max(math.ceil(-capacity * math.log(error_rate) / math.log(2) ** 2), 8)
+        self.n_hashes = max(round(self.n_bits / capacity * math.log(2)), 1)
+        self.bits = np.zeros((self.n_bits + 7) // 8, dtype=np.uint8)
+        self.n_items = 0
+
+    def __len__(self):
+        return self.n_items
+
+    def get_positions(self, tokens: List[str]):
+        """
+        :return: Bit positions of the sequence, derived by double hashing
+        """
+        h1, h2 = hash_sequence(tokens)
+        return [(h1 + i * h2) % self.n_bits for i in range(self.n_hashes)]
+
+    def add(self, tokens: List[str]):
+        """
+        :return: True if the sequence was (probably) not seen before
+        """
+        is_new = False
+        for position in self.get_positions(tokens):
+            byte, mask = position >> 3, 1 << (position & 7)
+            if not self.bits[byte] & mask:
+                self.bits[byte] |= mask
+                is_new = True
+        if is_new:
+            self.n_items += 1
+        return is_new
+
+
+def build_dedup_filter(method: str, sequences: Iterable[List[List[str]]], capacity: int, error_rate: float = 1e-6):
+    """
+    Create corpus-wide dedup filter, seeded with the tokens of the original sentences
+    :param method: "hash" for an exact set of hashes or "bloom" for a memory-bounded Bloom filter
+    :param sequences: Iterable of [[tokens], [tags_col_1], ...] original sentences
+    :param capacity: Expected number of original and augmented sentences, used to size the Bloom filter
+    :param error_rate: False positive rate of the Bloom filter
+    :return: HashFilter or BloomFilter
+    """
+    if method == "hash":
+        dedup_filter = HashFilter()
+    elif method == "bloom":
+        dedup_filter = BloomFilter(capacity=capacity, error_rate=error_rate)
+    else:
+        raise ValueError(f"Unknown dedup method: {method}. Choose from 'hash' and 'bloom'")
+    for sequence in sequences:
+        dedup_filter.add(sequence[0])
+    return dedup_filter
@@ -0,0 +1,32 @@
+import numpy as np
+
+
+def get_sample_rng(seed: int, sample_index: int):
+    """
+    Create an independent random generator for one sample. The stream only depends on the seed and the index of the
+    sample, not on the order in which samples are processed.
+    :param seed: Random seed of the augmentation run
+    :param sample_index: Index of sample
+    :return: numpy.random.Generator
+    """
+    return np.random.default_rng(np.random.SeedSequence(seed, spawn_key=(sample_index,)))
+
+
+def get_content_rng(seed: int, content_hash: bytes):
+    """
+    Create a random generator for one sample from its content instead of its index, so a sentence is augmented the
+    same way wherever it ends up in a growing corpus
+    :param seed: Random seed of the augmentation run
+    :param content_hash: Digest of the content of the sample
+    :return: numpy.random.Generator
+    """
+    return np.random.default_rng(np.random.SeedSequence(seed, spawn_key=(int.from_bytes(content_hash, "little"),)))
+
+
+def check_random_state(rng: np.random.Generator = None, seed: int = 0):
+    """
+    :param rng: Random generator or None
+    :param seed: Seed of new generator if rng is None
+    :return: numpy.random.Generator
+    """
+    return np.random.default_rng(seed) if rng is None else rng
@@ -0,0 +1,121 @@
+import functools
+import hashlib
+import json
+import os
+import sqlite3
+from typing import List
+
+# Sources whose changes can change augmented samples: strategies as well as the label indices, similarity search and
+# segmentation they use. Cached results of other code versions are never replayed.
+_CODE_PATHS = ("augmentation", "dataset")
+_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+@functools.lru_cache(maxsize=None)
+def get_code_version():
+    """
+    :return: Hex digest of the augmentation and dataset sources
+    """
+    paths = []
+    for code_path in _CODE_PATHS:
+        path = os.path.join(_ROOT, code_path)
+        if os.path.isfile(path):
+            paths.append(path)
+        for directory, _, files in os.walk(path):
+            paths.extend(os.path.join(directory, file) for file in files if file.endswith(".py"))
+    digest = hashlib.blake2b(digest_size=16)
+    for path in sorted(paths):
+        digest.update(os.path.relpath(path, _ROOT).encode("utf-8"))
+        with open(path, "rb") as src_f:
+            digest.update(src_f.read())
+    return digest.hexdigest()
+
+
+def hash_sample(sample: List[List[str]]):
+    """
+    :param sample: Sample as [[tokens], [tags_col_1], ...]
+    :return: 128 bit digest of the content of all columns
+    """
+    return hashlib.blake2b(json.dumps(sample, ensure_ascii=False).encode("utf-8"), digest_size=16).digest()
+
+
+class ResultCache:
+    """
+    Persistent cache of augmented samples, keyed by the content of the sample and everything else its augmentation
+    depends on: strategy, parameters, similarity model, seed and code version. Sentences which are unchanged since an
+    earlier run are replayed from the cache instead of being augmented again.
+    Strategies drawing replacements from corpus-wide vocabularies replay the replacements drawn when the entry was
+    stored.
+    """
+
+    def __init__(self, db_path: str):
+        """
+        :param db_path: Path to sqlite file
+        """
+        self.db_path = db_path
+        self.connection = None
+        self.connect()
+
+    def connect(self):
+        """
+        Open sqlite store and create table if necessary
+        """
+        self.connection = sqlite3.connect(self.db_path, timeout=60)
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        self.connection.execute("CREATE TABLE IF NOT EXISTS results (key BLOB PRIMARY KEY, samples TEXT)")
+        self.connection.commit()
+
+    @staticmethod
+    def get_keys(content_hashes: List[bytes], strategy: str, params: dict):
+        """
+        :param content_hashes: Content hash of each sample
+        :param strategy: Strategy name or composition of strategies joined by "+"
+        :param params: Augmentation parameters the result depends on, e.g. probability, iterations and seed
+        :return: Cache key of each sample
+        """
+        prefix = json.dumps([strategy, params, get_code_version()], sort_keys=True).encode("utf-8")
+        return [hashlib.blake2b(prefix + content_hash, digest_size=16).digest() for content_hash in content_hashes]
+
+    def get_many(self, keys: List[bytes]):
+        """
+        :return: List of cached augmented samples, None for samples which are not cached
+        """
+        found = {}
+        # Stay below the number of host parameters older sqlite versions allow per statement
+        for start in range(0, len(keys), 900):
+            batch = keys[start:start + 900]
+            found.update(self.connection.execute(f"SELECT key, samples FROM results "
+                                                 f"WHERE key IN ({', '.join('?' * len(batch))})", batch))
+        return [json.loads(found[key]) if key in found else None for key in keys]
+
+    def put_many(self, keys: List[bytes], results: List[List[List[List[str]]]]):
+        """
+        :param keys: Cache key of each sample
+        :param results: Augmented samples of each sample
+        """
+        if keys:
+            with self.connection:
+                self.connection.executemany("INSERT OR REPLACE INTO results VALUES (?, ?)",
+                                            [(key, json.dumps(augmented_samples, ensure_ascii=False))
+                                             for key, augmented_samples in zip(keys, results)])
+
+    def reconnect(self):
+        """
+        Open a fresh connection, e.g. in a forked worker process. The inherited connection must not be used there.
+        """
+        self.connection = None
+        self.connect()
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        state["connection"] = None
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self.connect()
+
+    def close(self):
+        if self.connection is not None:
+            self.connection.close()
+            self.connection = None
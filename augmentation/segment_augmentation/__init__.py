@@ -1 +1,2 @@
 from augmentation.segment_augmentation.simple_segment_augmentation import SimpleSegmentBasedAugmentation
+from augmentation.segment_augmentation.similarity_based_augmentation import SimilarityTokenAugmentation
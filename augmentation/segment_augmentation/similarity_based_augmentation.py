@@ -1,25 +1,74 @@
 from typing import List
 
+import numpy as np
+
+from augmentation.random_state import check_random_state
 from dataset import Mappings
-from dataset import Dataset
-from dataset import SequenceSegmentation
+from dataset import SequenceSegmentation, Spans
 
 
 class SimilarityTokenAugmentation(SequenceSegmentation):
-    def __init__(self, sequence: List[str], labels: List[str]):
-        super().__init__(sequence=sequence, labels=labels)
-
+    def __init__(self, sequence: List[str], labels: List[str], spans: Spans = None):
+        super().__init__(sequence=sequence, labels=labels, spans=spans)
 
-    def similarity_context_token_replacement(self):
-        pass
-
-    def similarity_entity_token_replacement(self):
-        pass
+    def similarity_context_token_replacement(self, mappings: Mappings, p: float = 0.5, n: int = 5,
+                                             entity_column: int = 1, rng: np.random.Generator = None):
+        """
+        Randomly replace context tokens (labelled "O") by one of their top n most similar context tokens
+        :param mappings: Mappings of the corpus providing the similarity indices
+        :param p: Random probability
+        :param n: Number of most similar tokens to choose the replacement from
+        :param entity_column: Index of entity column the labels belong to
+        :param rng: Random generator. Default: generator seeded with 0
+        :return: List of tokens sequence with replaced context tokens
+        """
+        positions = [i for i, label in enumerate(self.labels) if label == "O"]
+        return self.similarity_based_token_replacement(mappings, p=p, n=n, entity_column=entity_column,
+                                                       positions=positions, rng=rng)
 
-    def similarity_based_token_replacement(self):
+    def similarity_entity_token_replacement(self, mappings: Mappings, p: float = 0.5, n: int = 5,
+                                            entity_column: int = 1, rng: np.random.Generator = None):
+        """
+        Randomly replace entity tokens by one of their top n most similar tokens of the same entity label
+        :param mappings: Mappings of the corpus providing the similarity indices
+        :param p: Random probability
+        :param n: Number of most similar tokens to choose the replacement from
+        :param entity_column: Index of entity column the labels belong to
+        :param rng: Random generator. Default: generator seeded with 0
+        :return: List of tokens sequence with replaced entity tokens
         """
+        positions = [pos for _, segment_positions in self.get_annotated_segment() for pos in segment_positions]
+        return self.similarity_based_token_replacement(mappings, p=p, n=n, entity_column=entity_column,
+                                                       positions=positions, rng=rng)
 
-        :return:
+    def similarity_based_token_replacement(self, mappings: Mappings, p: float = 0.5, n: int = 5,
+                                           entity_column: int = 1, positions: List[int] = None,
+                                           rng: np.random.Generator = None):
         """
-        # TODO: Replace token by top n similarity. Augment for n times
-        pass
+        Randomly replace tokens by one of their top n most similar tokens with the same label.
+        Neighbours of all selected tokens of a label are looked up in one batched query.
+        :param mappings: Mappings of the corpus providing the similarity indices
+        :param p: Random probability
+        :param n: Number of most similar tokens to choose the replacement from
+        :param entity_column: Index of entity column the labels belong to
+        :param positions: Positions of tokens which may be replaced. Default: all tokens
+        :param rng: Random generator. Default: generator seeded with 0
+        :return: List of tokens sequence with replaced tokens
+        """
+        rng = check_random_state(rng)
+        sequence = list(self.sequence)
+        positions = list(range(len(sequence))) if positions is None else positions
+        selected = [pos for pos, rand in zip(positions, (rng.random(len(positions)) < p).tolist()) if rand]
+
+        positions_by_label = {}
+        for pos in selected:
+            positions_by_label.setdefault(self.labels[pos], []).append(pos)
+        for label, label_positions in positions_by_label.items():
+            similarities = mappings.get_top_n_similarities_batch([sequence[pos] for pos in label_positions],
+                                                                 n=n,
+                                                                 label=label,
+                                                                 entity_column=entity_column)
+            for pos, similar_tokens in zip(label_positions, similarities):
+                if similar_tokens:
+                    sequence[pos] = similar_tokens[rng.integers(len(similar_tokens))]
+        return sequence
@@ -1,144 +1,178 @@
-import math
+from augmentation.random_state import check_random_state
+from dataset.label_index import LabelTokenIndex
+from dataset.segmentation import SequenceSegmentation, Spans
 
-from dataset.segmentation import SequenceSegmentation
-
-from copy import deepcopy
 from typing import List, Dict
 
 import numpy as np
 import itertools
-import random
+
+
+def remove_positions(columns: List[List[str]], positions: List[int]):
+    """
+    Remove the same positions from all columns of a sequence with a single shared keep-mask
+    :param columns: Columns of equal length, e.g. [[tokens], [tags_col_1], ...]
+    :param positions: Positions to remove
+    :return: List of realigned columns
+    """
+    if not positions:
+        return [list(column) for column in columns]
+    keep = [True] * len(columns[0])
+    for pos in positions:
+        keep[pos] = False
+    return [list(itertools.compress(column, keep)) for column in columns]
 
 
 class SimpleSegmentBasedAugmentation(SequenceSegmentation):
-    def __init__(self, sequence: List[str], labels: List[str]):
-        super().__init__(sequence=sequence, labels=labels)
+    def __init__(self, sequence: List[str], labels: List[str], spans: Spans = None):
+        super().__init__(sequence=sequence, labels=labels, spans=spans)
 
-    def random_swap_first_last_segment_tokens(self, p: float = 0.5):
+    def random_swap_first_last_segment_tokens(self, p: float = 0.5, rng: np.random.Generator = None):
         """
         Randomly swap first and last token inside entity segment
         :param p: Random probability
+        :param rng: Random generator. Default: generator seeded with 0
         :return: List of sequences with randomly tokens swapped entity
         """
-        sequence = deepcopy(self.sequence)
-        for segment, positions in self.get_annotated_segment():
-            if len(segment) >= 1:
-                seed = math.floor(len(segment) * p)
-                np.random.seed(seed)
-                if np.random.binomial(1, p, 1)[0] == 1:
-                    sequence[positions[0]] = segment[-1]
-                    sequence[positions[-1]] = segment[0]
+        rng = check_random_state(rng)
+        sequence = list(self.sequence)
+        segments = list(self.get_annotated_segment())
+        # Draw decisions for all segments at once
+        for (segment, positions), swap in zip(segments, (rng.random(len(segments)) < p).tolist()):
+            if len(segment) >= 1 and swap:
+                sequence[positions[0]] = segment[-1]
+                sequence[positions[-1]] = segment[0]
         return sequence
 
     def random_remove_entity_neighbor(self,
                                       left: bool = True,
                                       right: bool = False,
                                       p: float = 0.5,
-                                      return_pos_ids: bool = False):
+                                      return_pos_ids: bool = False,
+                                      rng: np.random.Generator = None):
         """
         Randomly remove neighbor tokens of entity spans.
         :param left: Whether the left neighbored token should be deleted
         :param right: Whether right neighbored token should be deleted
         :param p: Random probability
         :param return_pos_ids: Whether a list of tokens positions within segment should be returned
+        :param rng: Random generator. Default: generator seeded with 0
         :return: Modified list of tokens, labels and position ids
         """
-        sequence = deepcopy(self.sequence)
-        labels = deepcopy(self.labels)
-        pos_ids = []    # Positions of neighbor tokens
-        for segment, positions in self.get_annotated_segment():
-            if left:
-                pos_ids.append(positions[0] - 1)
-            if right:
-                pos_ids.append(positions[-1] + 1)
-
-        # Random seed for reproducibility using length of pos_ids and probability value p
-        seed = math.floor(len(pos_ids) * p)
-        np.random.seed(seed)
-        random_distribution = np.random.binomial(1, p, len(pos_ids)).tolist() if not left or not right else [1] * len(
-            pos_ids)
-
-        pos_ids = [pos_ids[i] for i, rand in enumerate(random_distribution)
-                   if rand != 0  # Value from random binomial distribution shouldn't be 0
-                   # Entity token shouldn't be the first or the last token of the sequence
-                   and 0 <= pos_ids[i] < len(sequence)
-                   # Ignore strategy if the token of prev or next segment is also an entity
-                   and ("B-" not in labels[pos_ids[i]] and
-                        "I-" not in labels[pos_ids[i]]
-                        )
-                   ]
+        pos_ids = self.get_removed_neighbor_positions(left=left, right=right, p=p, rng=rng)
         # Generate augmented tokens sequence and adjust corresponding labels list
-        sequence = [sequence[j] for j, _ in enumerate(sequence) if j not in pos_ids]
-        labels = [labels[j] for j, _ in enumerate(labels) if j not in pos_ids]
+        sequence, labels = remove_positions([self.sequence, self.labels], pos_ids)
         if not return_pos_ids:
             return sequence, labels
         else:
             return sequence, labels, pos_ids
 
-    def label_wise_token_replacement(self, labels_to_tokens_map: Dict[str, List[str]], p: float = 0.5):
+    def get_removed_neighbor_positions(self,
+                                       left: bool = True,
+                                       right: bool = False,
+                                       p: float = 0.5,
+                                       rng: np.random.Generator = None):
+        """
+        Randomly choose neighbor tokens of entity spans to be removed.
+        :param left: Whether the left neighbored token should be deleted
+        :param right: Whether right neighbored token should be deleted
+        :param p: Random probability
+        :param rng: Random generator. Default: generator seeded with 0
+        :return: List of positions of removed tokens
+        """
+        rng = check_random_state(rng)
+        labels = self.labels
+        pos_ids = []    # Positions of neighbor tokens
+        for start, end, _ in self.spans:
+            if left:
+                pos_ids.append(start - 1)
+            if right:
+                pos_ids.append(end)
+
+        random_distribution = (rng.random(len(pos_ids)) < p).tolist() if not left or not right else [True] * len(
+            pos_ids)
+
+        return [pos_ids[i] for i, rand in enumerate(random_distribution)
+                if rand  # Neighbor is only removed on a positive random decision
+                # Entity token shouldn't be the first or the last token of the sequence
+                and 0 <= pos_ids[i] < len(labels)
+                # Ignore strategy if the token of prev or next segment is also an entity
+                and ("B-" not in labels[pos_ids[i]] and
+                     "I-" not in labels[pos_ids[i]]
+                     )
+                ]
+
+    def label_wise_token_replacement(self,
+                                     labels_to_tokens_map: Dict[str, List[str]] | LabelTokenIndex,
+                                     p: float = 0.5,
+                                     weighted: bool = False,
+                                     rng: np.random.Generator = None):
         """
         Randomly replace an entity token with another in the same entity-tag category
-        :param labels_to_tokens_map: Dictionary of labels tokens mapping
+        :param labels_to_tokens_map: Dictionary of labels tokens mapping or labels to tokens index
         :param p: Random probability
+        :param weighted: Whether replacements should be drawn proportional to their corpus frequency.
+        Requires a labels to tokens index
+        :param rng: Random generator. Default: generator seeded with 0
         :return: List of tokens sequence with replaced entity tokens
         """
-        sequence = deepcopy(self.sequence)
+        rng = check_random_state(rng)
+        sequence = list(self.sequence)
         labels = self.labels
         chosen = []
-        for segment, positions in self.get_annotated_segment():
+        segments = list(self.get_annotated_segment())
+        # Draw decisions for all entity tokens at once
+        decisions = iter((rng.random(sum(len(positions) for _, positions in segments)) < p).tolist())
+        for segment, positions in segments:
             for i, pos in enumerate(positions):
                 chosen.append(segment[i])
-                # Create seed for reproducibility based on length of segment and p
-                seed = math.floor(len(segment) * p)
-                np.random.seed(seed)
-                if np.random.binomial(1, p, 1)[0] == 1:
+                if next(decisions):
                     # Random select a token from the same label class of the original token
-                    replacement = np.random.choice(labels_to_tokens_map[labels[pos]])
+                    if isinstance(labels_to_tokens_map, LabelTokenIndex):
+                        replacement = labels_to_tokens_map.sample(labels[pos], rng, weighted=weighted)
+                    else:
+                        candidates = labels_to_tokens_map[labels[pos]]
+                        replacement = candidates[rng.integers(len(candidates))]
                     if replacement not in chosen:
                         segment[i] = replacement
                         chosen.append(replacement)
                 sequence[pos] = segment[i]
         return sequence
 
-    def shuffle_within_entity_segment(self, p: float = 0.5):
+    def shuffle_within_entity_segment(self, p: float = 0.5, rng: np.random.Generator = None):
         """
         Shuffle random annotated entity segment
         :param p: Random probability
+        :param rng: Random generator. Default: generator seeded with 0
         :return: List of tokens sequence with shuffled entity spans
         """
-        sequence = deepcopy(self.sequence)
-        for segment, positions in self.get_annotated_segment():
-            # Random seed for reproducibility
-            seed = math.floor(len(segment) * p)
-            np.random.seed(seed)
-            if len(segment) > 1 and np.random.binomial(1, p, 1)[0] == 1:
-                np.random.shuffle(segment)
-            for i, _ in enumerate(sequence):
-                if i in positions:
-                    sequence[i] = segment[positions.index(i)]
+        rng = check_random_state(rng)
+        sequence = list(self.sequence)
+        segments = list(self.get_annotated_segment())
+        for (segment, positions), shuffle in zip(segments, (rng.random(len(segments)) < p).tolist()):
+            if len(segment) > 1 and shuffle:
+                rng.shuffle(segment)
+            for pos, token in zip(positions, segment):
+                sequence[pos] = token
         return sequence
 
-    def shuffle_within_segments(self, p: float = 0.5):
+    def shuffle_within_segments(self, p: float = 0.5, rng: np.random.Generator = None):
         """
         Random shuffle segments within a sequence
         :param p: Random probability
+        :param rng: Random generator. Default: generator seeded with 0
         :return: List of randomly shuffled tokens segments
         """
+        rng = check_random_state(rng)
         segmented = self.get_tags_based_segments()
-        for i, _ in enumerate(segmented):
-            # Random seed for reproducibility
-            seed = math.floor(len(segmented[i]) * p)
-            np.random.seed(seed)
-            if len(segmented[i]) > 1 and np.random.binomial(1, p, 1)[0] == 1:
-                np.random.shuffle(segmented[i])
+        for segment, shuffle in zip(segmented, (rng.random(len(segmented)) < p).tolist()):
+            if len(segment) > 1 and shuffle:
+                rng.shuffle(segment)
         sequence = list(itertools.chain.from_iterable(segmented))
         return sequence
 
 
 if __name__ == "__main__":
-    np.random.seed(1)
-    print(np.random.binomial(1, 0.5, 1)[0])
-
     tokens = ["Hello", ",", "my", "name", "is", "Monkey", "D.", "Luffy", "and",
               "I", "am", "gonna", "be", "the", "King", "of", "the", "Pirates", "."]
 
@@ -0,0 +1,102 @@
+import warnings
+from array import array
+from typing import List, Tuple
+
+from utils.writers import SequenceWriter
+
+
+class CountingSink:
+    """
+    Count augmented samples of a strategy per sample without keeping them
+    """
+
+    def __init__(self):
+        self.offsets = array("q", [0])  # Augmented samples of sample i are number offsets[i] to offsets[i + 1]
+
+    def __len__(self):
+        """ Return number of augmented samples"""
+        return self.offsets[-1]
+
+    def add(self, augmented_samples: List[List[List[str]]]):
+        """
+        :param augmented_samples: Augmented samples generated from the next sample
+        """
+        self.offsets.append(self.offsets[-1] + len(augmented_samples))
+
+    def get_n_augmented(self, n_samples: int = None):
+        """
+        :param n_samples: Only count augmented samples of the first n samples. Default: all samples
+        :return: Number of augmented samples
+        """
+        if n_samples is None:
+            return len(self)
+        if n_samples >= len(self.offsets):
+            raise ValueError(f"Only {len(self.offsets) - 1} samples were augmented, {n_samples} requested")
+        return self.offsets[n_samples]
+
+    def close(self):
+        pass
+
+
+class MemorySink(CountingSink):
+    """
+    Keep augmented samples of a strategy in memory, together with the sample they were generated from
+    """
+
+    def __init__(self):
+        super().__init__()
+        self.samples = []
+
+    def add(self, augmented_samples: List[List[List[str]]]):
+        self.samples.extend(augmented_samples)
+        super().add(augmented_samples)
+
+
+class WriterSink(CountingSink):
+    """
+    Stream augmented samples of a strategy straight into writers, so memory stays flat regardless of corpus size.
+    Each writer may be limited to the first n samples, e.g. to write the outputs of several nested sample ratios
+    in one pass. Writers are closed as soon as their last sample is written, which releases their buffers.
+    """
+
+    def __init__(self, writers: List[Tuple[SequenceWriter, int]]):
+        """
+        :param writers: List of (writer, number of samples or None for all samples) tuples
+        """
+        super().__init__()
+        self.writers = writers
+        self.active = list(writers)  # Writers still expecting samples
+        self.close_finished(0)
+
+    def add(self, augmented_samples: List[List[List[str]]]):
+        """
+        Augmented samples are encoded by all writers before any of them writes. Samples rejected by one writer are
+        written to none and not counted, so stats and all files match.
+        """
+        written = []
+        for augmented_sample in augmented_samples:
+            try:
+                encoded = [writer.encode(augmented_sample) for writer, _ in self.active]
+            except ValueError as error:
+                warnings.warn(f"Skip sentence: {error}")
+                continue
+            for (writer, _), text in zip(self.active, encoded):
+                writer.write_encoded(text)
+            written.append(augmented_sample)
+        super().add(written)
+        self.close_finished(len(self.offsets) - 1)
+
+    def close_finished(self, n_samples: int):
+        """
+        Close writers which are limited to the first n samples
+        """
+        if any(limit is not None and limit <= n_samples for _, limit in self.active):
+            for writer, limit in self.active:
+                if limit is not None and limit <= n_samples:
+                    writer.close()
+            self.active = [(writer, limit) for writer, limit in self.active if limit is None or limit > n_samples]
+
+    def close(self):
+        for writer, _ in self.writers:
+            writer.close()
+        self.active = []
@@ -0,0 +1,254 @@
+from typing import List
+
+import numpy as np
+
+from augmentation.character_augmentation import CharacterNoise, SimpleCharacterBasedAugmentation
+from augmentation.segment_augmentation import SimpleSegmentBasedAugmentation, SimilarityTokenAugmentation
+from augmentation.segment_augmentation.simple_segment_augmentation import remove_positions
+from dataset.segmentation import Spans
+
+STRATEGIES = {}  # Registered strategies by name
+
+
+class Strategy:
+    """
+    Registered augmentation strategy
+    """
+    __slots__ = ("name", "kind", "function", "batch_function")
+
+    def __init__(self, name: str, kind: str, function):
+        """
+        :param name: Name of strategy as used on the command line
+        :param kind: "word" or "character"
+        :param function: Function (augmentation, context, rng) -> augmented sample as [[tokens], [tags_col_1], ...]
+        """
+        self.name = name
+        self.kind = kind
+        self.function = function
+        # Optional function (augmentation, samples, rngs) -> augmented samples, with the same result for each sample
+        self.batch_function = None
+
+    def __call__(self, augmentation, context, rng: np.random.Generator):
+        return self.function(augmentation, context, rng)
+
+
+def register_strategy(name: str, kind: str = "word"):
+    """
+    Decorator registering a strategy function under the given name
+    """
+    def decorator(function):
+        STRATEGIES[name] = Strategy(name, kind, function)
+        return function
+    return decorator
+
+
+def register_batch_function(name: str):
+    """
+    Decorator registering a batch version of a registered strategy, applied to a list of samples with one random
+    generator each. It must give the same result for each sample as the strategy function.
+    """
+    def decorator(function):
+        get_strategy(name).batch_function = function
+        return function
+    return decorator
+
+
+def get_strategy(name: str):
+    """
+    :param name: Name of a registered strategy
+    :return: Strategy
+    """
+    try:
+        return STRATEGIES[name]
+    except KeyError:
+        raise ValueError(f"Unknown augmentation strategy: {name}. Choose from {', '.join(STRATEGIES)}") from None
+
+
+def get_strategy_names(kind: str = None):
+    """
+    :param kind: Only return strategies of this kind. Default: all strategies
+    :return: List of registered strategy names
+    """
+    return [name for name, strategy in STRATEGIES.items() if kind is None or strategy.kind == kind]
+
+
+def get_strategy_chain(spec: str):
+    """
+    :param spec: Strategy name or composition of strategies joined by "+", applied from left to right.
+    E.g. "shuffle_in_entity+reverse_letter_case"
+    :return: List of strategies
+    """
+    return [get_strategy(name) for name in spec.split("+")]
+
+
+class SampleContext:
+    """
+    Sample together with its spans, decoded once and shared by the augmenters of every strategy applied to it
+    """
+    __slots__ = ("sample", "main_entity_column", "spans", "augmenters")
+
+    def __init__(self, sample: List[List[str]], main_entity_column: int = 1):
+        """
+        :param sample: Sample as [[tokens], [tags_col_1], ...]
+        :param main_entity_column: Index of main entity column
+        """
+        self.sample = sample
+        self.main_entity_column = main_entity_column
+        self.spans = Spans.from_labels(sample[main_entity_column])
+        self.augmenters = {}
+
+    def get(self, augmenter_class):
+        """
+        :param augmenter_class: SequenceSegmentation subclass
+        :return: Augmenter of the sample, created once per class
+        """
+        augmenter = self.augmenters.get(augmenter_class)
+        if augmenter is None:
+            augmenter = self.augmenters[augmenter_class] = augmenter_class(sequence=self.sample[0],
+                                                                         labels=self.sample[self.main_entity_column],
+                                                                         spans=self.spans)
+        return augmenter
+
+
+def apply_strategy_chain(augmentation, sample: List[List[str]], chain: List[Strategy], rng: np.random.Generator,
+                         context: SampleContext = None):
+    """
+    Apply a chain of strategies to a sample. Each strategy after the first works on the output of its predecessor.
+    :param augmentation: Augmentation instance providing the parameters of the run
+    :param sample: Sample as [[tokens], [tags_col_1], ...]
+    :param chain: List of strategies
+    :param rng: Random generator
+    :param context: Cached context of the sample. Default: created from sample
+    :return: Augmented sample
+    """
+    augmented = sample
+    for i, strategy in enumerate(chain):
+        if i > 0 or context is None:
+            context = SampleContext(augmented, augmentation.main_entity_column)
+        augmented = strategy(augmentation, context, rng)
+    return augmented
+
+
+def replace_tokens(context: SampleContext, augmented: List[str]):
+    """
+    :return: Sample with replaced tokens and unchanged tags
+    """
+    return [augmented] + context.sample[1:]
+
+
+def replace_batch_tokens(samples: List[List[List[str]]], augmented: List[List[str]]):
+    """
+    :return: Samples with replaced tokens and unchanged tags
+    """
+    return [[tokens] + sample[1:] for sample, tokens in zip(samples, augmented)]
+
+
+def remove_neighbors(augmentation, context: SampleContext, rng: np.random.Generator, left: bool, right: bool):
+    """
+    Remove neighbours of entity spans and drop the same positions from tokens and all tag columns at once
+    """
+    pos_ids = context.get(SimpleSegmentBasedAugmentation).get_removed_neighbor_positions(
+        left=left,
+        right=right,
+        p=augmentation.p_augmentation,
+        rng=rng
+    )
+    return remove_positions(context.sample, pos_ids)
+
+
+@register_strategy("swap_first_last")
+def swap_first_last(augmentation, context: SampleContext, rng: np.random.Generator):
+    return replace_tokens(context, context.get(SimpleSegmentBasedAugmentation).random_swap_first_last_segment_tokens(
+        p=augmentation.p_augmentation, rng=rng))
+
+
+@register_strategy("remove_left_neighbor")
+def remove_left_neighbor(augmentation, context: SampleContext, rng: np.random.Generator):
+    return remove_neighbors(augmentation, context, rng, left=True, right=False)
+
+
+@register_strategy("remove_right_neighbor")
+def remove_right_neighbor(augmentation, context: SampleContext, rng: np.random.Generator):
+    return remove_neighbors(augmentation, context, rng, left=False, right=True)
+
+
+@register_strategy("remove_surrounding_neighbors")
+def remove_surrounding_neighbors(augmentation, context: SampleContext, rng: np.random.Generator):
+    return remove_neighbors(augmentation, context, rng, left=True, right=True)
+
+
+@register_strategy("label_wise_replacement")
+def label_wise_replacement(augmentation, context: SampleContext, rng: np.random.Generator):
+    return replace_tokens(context, context.get(SimpleSegmentBasedAugmentation).label_wise_token_replacement(
+        labels_to_tokens_map=augmentation.label_token_index,
+        p=augmentation.p_augmentation,
+        weighted=augmentation.weighted_replacement,
+        rng=rng))
+
+
+@register_strategy("shuffle_in_entity")
+def shuffle_in_entity(augmentation, context: SampleContext, rng: np.random.Generator):
+    return replace_tokens(context, context.get(SimpleSegmentBasedAugmentation).shuffle_within_entity_segment(
+        p=augmentation.p_augmentation, rng=rng))
+
+
+@register_strategy("shuffle_in_segments")
+def shuffle_in_segments(augmentation, context: SampleContext, rng: np.random.Generator):
+    return replace_tokens(context, context.get(SimpleSegmentBasedAugmentation).shuffle_within_segments(
+        p=augmentation.p_augmentation, rng=rng))
+
+
+@register_strategy("similarity_entity_replacement")
+def similarity_entity_replacement(augmentation, context: SampleContext, rng: np.random.Generator):
+    return replace_tokens(context, context.get(SimilarityTokenAugmentation).similarity_entity_token_replacement(
+        mappings=augmentation.corpus.mappings,
+        p=augmentation.p_augmentation,
+        n=augmentation.n_similarities,
+        entity_column=augmentation.main_entity_column,
+        rng=rng))
+
+
+@register_strategy("similarity_context_replacement")
+def similarity_context_replacement(augmentation, context: SampleContext, rng: np.random.Generator):
+    return replace_tokens(context, context.get(SimilarityTokenAugmentation).similarity_context_token_replacement(
+        mappings=augmentation.corpus.mappings,
+        p=augmentation.p_augmentation,
+        n=augmentation.n_similarities,
+        entity_column=augmentation.main_entity_column,
+        rng=rng))
+
+
+@register_strategy("reverse_letter_case", kind="character")
+def reverse_letter_case(augmentation, context: SampleContext, rng: np.random.Generator):
+    return replace_tokens(context, context.get(SimpleCharacterBasedAugmentation).random_reverse_letter_case(
+        p=augmentation.p_augmentation, rng=rng))
+
+
+@register_strategy("delete_character", kind="character")
+def delete_character(augmentation, context: SampleContext, rng: np.random.Generator):
+    return replace_tokens(context, context.get(SimpleCharacterBasedAugmentation).random_delete_character(
+        p=augmentation.p_augmentation, rng=rng))
+
+
+@register_strategy("shuffle_characters_in_token", kind="character")
+def shuffle_characters_in_token(augmentation, context: SampleContext, rng: np.random.Generator):
+    return replace_tokens(context, context.get(SimpleCharacterBasedAugmentation).random_shuffle_chars_in_token(
+        p=augmentation.p_augmentation, rng=rng))
+
+
+@register_batch_function("reverse_letter_case")
+def reverse_letter_case_batch(augmentation, samples: List[List[List[str]]], rngs: List[np.random.Generator]):
+    return replace_batch_tokens(samples, CharacterNoise(augmentation.p_augmentation).reverse_letter_case(
+        [sample[0] for sample in samples], rngs))
+
+
+@register_batch_function("delete_character")
+def delete_character_batch(augmentation, samples: List[List[List[str]]], rngs: List[np.random.Generator]):
+    return replace_batch_tokens(samples, CharacterNoise(augmentation.p_augmentation).delete_character(
+        [sample[0] for sample in samples], rngs))
+
+
+@register_batch_function("shuffle_characters_in_token")
+def shuffle_characters_in_token_batch(augmentation, samples: List[List[List[str]]], rngs: List[np.random.Generator]):
+    return replace_batch_tokens(samples, CharacterNoise(augmentation.p_augmentation).shuffle_characters(
+        [sample[0] for sample in samples], rngs))
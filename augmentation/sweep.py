@@ -0,0 +1,348 @@
+import json
+import math
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import nullcontext
+from typing import Dict, List, Tuple
+
+from augmentation.augment import Augmentation
+from augmentation.sinks import WriterSink
+from dataset import Corpus
+from dataset.cache import hash_file
+from utils import JsonLinesWriter, TsvWriter
+from utils.metrics import Profiler
+
+STATS_HEADER = ("strategy\tn_sentences_total\tn_entity_sentences\tn_samples\t"
+                "n_iteration\tn_augmentation\tsample_ratio\taugmentation_ratio\ttotal_ratio\n")
+
+WRITE_BUFFER_BUDGET = 1 << 25  # Bytes of write buffers of all writers of a task
+
+# Augmentation arguments which only change how fast samples are produced, not the samples themselves
+RUNTIME_KWARGS = ("workers", "chunk_size", "result_cache_path")
+
+_worker_sweep = None  # Sweep instance of the current worker process
+
+
+def _init_worker(sweep):
+    """
+    Store sweep in worker process. With fork, the sweep and its parsed corpus are shared copy-on-write.
+    """
+    global _worker_sweep
+    _worker_sweep = sweep
+    sweep.corpus.mappings.similarity_cache.reconnect()
+
+
+def _run_task(task: Tuple[List[str], List[float]]):
+    return _worker_sweep.run_task(task)
+
+
+class Sweep:
+    """
+    Run augmentation for every job of a strategy x sample ratio grid, optionally concurrently
+    """
+
+    def __init__(self,
+                 corpus: Corpus,
+                 jobs: List[Tuple[str, float]],
+                 output_path: str,
+                 n_iteration: int = 1,
+                 augmentation_kwargs: dict = None,
+                 to_tsv: bool = False,
+                 to_json: bool = False,
+                 json_columns: List[str] = None,
+                 compact_json: bool = False,
+                 compress: bool = False,
+                 n_jobs: int = 1,
+                 resume: bool = False,
+                 nested: bool = False,
+                 fused: bool = False,
+                 profile: bool = False,
+                 ):
+        """
+        :param corpus: Parsed corpus, shared read-only by all jobs
+        :param jobs: List of (strategy, sample ratio) tuples
+        :param output_path: Path to folder to store output files
+        :param n_iteration: Number of augmentation rounds
+        :param augmentation_kwargs: Further keyword arguments for Augmentation
+        :param to_tsv: Whether augmented data should be written to tsv
+        :param to_json: Whether augmented data should be written to json
+        :param json_columns: Optional columns for json file
+        :param compact_json: Whether json files should be written in compact form with the fastest available encoder
+        :param compress: Whether output files should be gzip-compressed
+        :param n_jobs: Number of jobs running concurrently
+        :param resume: Whether jobs completed by a previous run with the same parameters and input should be skipped
+        :param nested: Whether all sample ratios of a strategy should be served by a single run at the largest ratio.
+        Samples of smaller ratios are prefixes of the samples of larger ones, so outputs don't change.
+        :param fused: Whether all strategies of a sample ratio should be applied in a single pass over the samples
+        :param profile: Whether each task should run under cProfile and tracemalloc, dumping one profile per strategy
+        and one of the rest of the task to profile/. Requires a single worker per augmentation
+        """
+        self.corpus = corpus
+        self.jobs = jobs
+        self.output_path = output_path
+        self.n_iteration = n_iteration
+        self.augmentation_kwargs = {} if augmentation_kwargs is None else augmentation_kwargs
+        self.to_tsv = to_tsv
+        self.to_json = to_json
+        n_columns = 1 + len(corpus.tag_columns)
+        if to_json and json_columns is not None and len(json_columns) != n_columns:
+            raise ValueError(f"{len(json_columns)} json columns were given, but samples have {n_columns} columns: "
+                             f"word column and {len(corpus.tag_columns)} tag column(s)")
+        self.json_columns = json_columns
+        self.compact_json = compact_json
+        self.compress = compress
+        self.n_jobs = n_jobs
+        self.resume = resume
+        self.nested = nested
+        self.fused = fused
+        if profile and self.augmentation_kwargs.get("workers", 1) > 1:
+            raise ValueError("Profiling requires a single worker, since worker processes are not profiled")
+        self.profile = profile
+        self.profile_path = f"{output_path}/profile"
+        self.task_metrics = []  # Metrics of each task that was run
+        # Stats rows and parameters of completed jobs are kept in a sub folder, which is ignored by the data joiner
+        self.state_path = f"{output_path}/.sweep"
+        self.input_params = None  # Input file fingerprint and parsing settings, computed once per sweep
+
+    def get_output_name(self, strategy: str, ratio: float):
+        return f"{strategy}-{ratio}-{self.n_iteration}"
+
+    def get_output_files(self, name: str):
+        """
+        :return: Paths of output files written for the given output name
+        """
+        if self.output_path is None:
+            return []
+        suffix = ".gz" if self.compress else ""
+        return ([f"{self.output_path}/{name}.tsv{suffix}"] if self.to_tsv else []) + \
+            ([f"{self.output_path}/{name}.json{suffix}"] if self.to_json else [])
+
+    def get_writer(self, output_file: str, buffer_size: int = 1 << 20):
+        """
+        :param output_file: Path to output file
+        :param buffer_size: Size of write buffer
+        :return: Writer of the given output file
+        """
+        # Only the file extension decides the format, output folders may contain ".tsv" as well
+        if output_file.endswith((".tsv", ".tsv.gz")):
+            return TsvWriter(output_file, buffer_size=buffer_size)
+        return JsonLinesWriter(output_file, columns=self.json_columns, compact=self.compact_json,
+                               buffer_size=buffer_size)
+
+    def get_tasks(self):
+        """
+        Group jobs into tasks of (strategies, sample ratios). Each task augments the corpus once at its largest ratio,
+        applying all of its strategies in a single pass. Without nesting and fusion, each task covers a single job.
+        """
+        tasks = {}
+        for strategy, ratio in self.jobs:
+            key = (strategy if not self.fused else None, ratio if not self.nested else None)
+            strategies, ratios = tasks.setdefault(key, ([], []))
+            if strategy not in strategies:
+                strategies.append(strategy)
+            if ratio not in ratios:
+                ratios.append(ratio)
+        return list(tasks.values())
+
+    def run(self):
+        """
+        Run all jobs and write their stats in grid order
+        """
+        os.makedirs(self.state_path, exist_ok=True)
+        self.get_input_params()  # Hash input file once, before tasks are forked into workers
+        if self.profile:
+            os.makedirs(self.profile_path, exist_ok=True)
+        with open(f"./{self.output_path}/augmentation_stats.tsv", "w") as file:
+            file.write(STATS_HEADER)
+            for stats_row in self.iter_results():
+                file.write(stats_row)
+                file.flush()
+        with open(f"./{self.output_path}/augmentation_metrics.json", "w", encoding="utf-8") as file:
+            json.dump({"corpus": self.corpus.metrics.to_dict(), "tasks": self.task_metrics}, file, indent=2)
+
+    def iter_results(self):
+        """
+        :return: Generator of stats rows in the order of jobs, regardless of the order jobs complete in
+        """
+        pending = [self.get_output_name(strategy, ratio) for strategy, ratio in self.jobs]
+        stats_rows = {}
+        for task_stats_rows, task_metrics in self.iter_task_results():
+            stats_rows.update(task_stats_rows)
+            if task_metrics is not None:
+                self.task_metrics.append(task_metrics)
+            while pending and pending[0] in stats_rows:
+                yield stats_rows.pop(pending.pop(0))
+
+    def iter_task_results(self):
+        """
+        :return: Generator of stats rows by output name and metrics of each task, in the order of tasks
+        """
+        tasks = self.get_tasks()
+        if self.n_jobs <= 1:
+            for task in tasks:
+                yield self.run_task(task)
+            return
+
+        context = multiprocessing.get_context("fork" if "fork" in multiprocessing.get_all_start_methods() else None)
+        with ProcessPoolExecutor(max_workers=self.n_jobs,
+                                 mp_context=context,
+                                 initializer=_init_worker,
+                                 initargs=(self,)) as executor:
+            yield from executor.map(_run_task, tasks)
+
+    def get_input_params(self):
+        """
+        :return: Fingerprint of the input file and the settings it was parsed with
+        """
+        if self.input_params is None:
+            dataset = self.corpus.dataset
+            self.input_params = {"input_hash": hash_file(dataset.inp_path),
+                                 "word_column": dataset.words_col,
+                                 "tag_columns": list(dataset.tags_col),
+                                 "comment_prefixes": list(dataset.comment_prefixes),
+                                 "main_entity_column": self.corpus.main_entity_column,
+                                 "similarity_model": self.corpus.mappings.cache_model_key}
+        return self.input_params
+
+    def get_job_params(self, strategy: str, ratio: float):
+        """
+        :return: Everything the outputs of a job depend on: input, strategy, sample ratio, augmentation parameters
+        and output format
+        """
+        return {"strategy": strategy,
+                "sample_ratio": ratio,
+                "n_iteration": self.n_iteration,
+                "augmentation": {key: value for key, value in sorted(self.augmentation_kwargs.items())
+                                 if key not in RUNTIME_KWARGS},
+                "json_columns": self.json_columns if self.to_json else None,
+                "compact_json": self.compact_json if self.to_json else None,
+                **self.get_input_params()}
+
+    def get_completed_stats_row(self, name: str, job_params: dict):
+        """
+        :param name: Output name of job
+        :param job_params: Parameters of job, as returned by get_job_params
+        :return: Stats row of the job if it was completed with the same parameters and input and all its output files
+        exist, None otherwise
+        """
+        try:
+            with open(f"{self.state_path}/{name}.json", "r", encoding="utf-8") as state_f:
+                state = json.load(state_f)
+        except (OSError, ValueError):
+            return None
+        # Compare in JSON form, as tuples are stored as lists
+        if state.get("params") != json.loads(json.dumps(job_params)):
+            return None
+        if not all(os.path.isfile(path) for path in self.get_output_files(name)):
+            return None
+        return state.get("stats_row")
+
+    def run_task(self, task: Tuple[List[str], List[float]]):
+        """
+        Augment corpus once at the largest of the given sample ratios, applying all strategies in a single pass.
+        Augmented samples are streamed into the output files of every strategy and ratio as they are produced, each
+        ratio receiving the nested prefix of samples, so augmented data is never held in memory.
+        The stats row is stored together with the job parameters after all outputs were written, so it marks the job as
+        completed for resuming with the same parameters and input.
+        :param task: (strategies, sample ratios)
+        :return: Dictionary of stats rows by output name and metrics of the task, None if it was skipped
+        """
+        strategies, ratios = task
+        jobs = [(strategy, ratio) for strategy in strategies for ratio in ratios]
+        names = {job: self.get_output_name(*job) for job in jobs}
+        job_params = {job: self.get_job_params(*job) for job in jobs}
+        stats_rows = {}
+        if self.resume:
+            for job, name in names.items():
+                stats_row = self.get_completed_stats_row(name, job_params[job])
+                if stats_row is not None:
+                    stats_rows[name] = stats_row
+            strategies = [strategy for strategy in strategies
+                          if any(names[(strategy, ratio)] not in stats_rows for ratio in ratios)]
+            if not strategies:
+                print(f"Skip completed augmentation: \nStrategy: {', '.join(task[0])}\t"
+                      f"Sample Ratio: {', '.join(map(str, ratios))}")
+                return stats_rows, None
+
+        augmentation = Augmentation(corpus=self.corpus,
+                                    sample_ratio=max(ratios),
+                                    n_iteration=self.n_iteration,
+                                    **self.augmentation_kwargs)
+        print(f"Create augmentation: \nStrategy: {', '.join(strategies)}\t"
+              f"Sample Ratio: {', '.join(map(str, ratios))}\tN_iteration: {self.n_iteration}")
+        n_entity_sentences = len(self.corpus.entity_sequences)
+        # Stream augmented samples of each strategy into the output files of all sample ratios. Writers of a task
+        # share a fixed buffer budget, split between the encoded lines and the file buffer of each writer
+        output_files = {strategy: [(output_file, math.floor(ratio * n_entity_sentences))
+                                   for ratio in ratios
+                                   for output_file in self.get_output_files(names[(strategy, ratio)])]
+                        for strategy in strategies}
+        n_writers = sum(map(len, output_files.values()))
+        buffer_size = min(1 << 20, max(1 << 16, WRITE_BUFFER_BUDGET // (2 * n_writers)))
+        sinks = {strategy: WriterSink([(self.get_writer(output_file, buffer_size), n_samples)
+                                       for output_file, n_samples in output_files[strategy]])
+                 for strategy in strategies}
+        start = time.perf_counter()
+        augmentation.profiler = Profiler() if self.profile else None
+        with augmentation.profiler.run() if self.profile else nullcontext():
+            augmentation.run(strategies, sinks=sinks)
+        if self.profile:
+            # Sampling, dedup and writes of the task are profiled apart from the strategies
+            augmentation.profiler.dump({"total": f"{self.profile_path}/{'-'.join(strategies)}-{max(ratios)}-other",
+                                        **{f"strategy:{strategy}": f"{self.profile_path}/{strategy}-{max(ratios)}"
+                                           for strategy in strategies}})
+        task_metrics = self.get_task_metrics(augmentation, strategies, ratios, sinks, time.perf_counter() - start)
+
+        for strategy in strategies:
+            if augmentation.dedup is not None:
+                print(f"Dropped duplicates ({strategy}): {augmentation.n_duplicates[strategy]}")
+            if augmentation.result_cache is not None:
+                counters = augmentation.metrics.counters
+                print(f"Result cache ({strategy}): {counters.get(f'cache_hits:{strategy}', 0)} hits, "
+                      f"{counters.get(f'cache_misses:{strategy}', 0)} misses")
+            for ratio in ratios:
+                name = names[(strategy, ratio)]
+                n_sentences, n_ent_sentences, n_samples, n_aug = augmentation.get_sizes(ratio, strategy)
+                stats_row = (f"{strategy}\t{n_sentences}\t{n_ent_sentences}\t{n_samples}\t{self.n_iteration}\t"
+                             f"{n_aug}\t{ratio}\t{n_aug / n_ent_sentences}\t{n_aug / n_sentences}\n")
+                state_file = f"{self.state_path}/{name}.json"
+                with open(f"{state_file}.tmp", "w", encoding="utf-8") as state_f:
+                    json.dump({"params": job_params[(strategy, ratio)], "stats_row": stats_row}, state_f)
+                os.replace(f"{state_file}.tmp", state_file)
+                stats_rows[name] = stats_row
+        return stats_rows, task_metrics
+
+    @staticmethod
+    def get_task_metrics(augmentation: Augmentation, strategies: List[str], ratios: List[float],
+                         sinks: Dict[str, WriterSink], seconds: float):
+        """
+        :return: Dictionary of wall time, stage times and per-strategy throughput, dedup and output metrics
+        """
+        timers, counters = augmentation.metrics.timers, augmentation.metrics.counters
+        strategy_metrics = {}
+        for strategy in strategies:
+            strategy_seconds = timers.get(f"strategy:{strategy}", 0.0)
+            n_generated = counters.get(f"generated:{strategy}", 0)
+            n_rejected = counters.get(f"sample_duplicates:{strategy}", 0) + \
+                counters.get(f"corpus_duplicates:{strategy}", 0)
+            strategy_metrics[strategy] = {
+                "seconds": strategy_seconds,
+                "sentences_per_sec": augmentation.n_samples / strategy_seconds if strategy_seconds else None,
+                "n_generated": n_generated,
+                "n_sample_duplicates": counters.get(f"sample_duplicates:{strategy}", 0),
+                "n_corpus_duplicates": counters.get(f"corpus_duplicates:{strategy}", 0),
+                "dedup_rejection_rate": n_rejected / n_generated if n_generated else None,
+                "bytes_written": {writer.output_path: writer.n_bytes for writer, _ in sinks[strategy].writers},
+            }
+            if augmentation.result_cache is not None:
+                strategy_metrics[strategy]["cache_hits"] = counters.get(f"cache_hits:{strategy}", 0)
+                strategy_metrics[strategy]["cache_misses"] = counters.get(f"cache_misses:{strategy}", 0)
+        return {"strategies": strategies,
+                "sample_ratios": ratios,
+                "n_samples": augmentation.n_samples,
+                "seconds": seconds,
+                "sentences_per_sec": augmentation.n_samples / seconds if seconds else None,
+                "stages": dict(timers),
+                "strategy_metrics": strategy_metrics}
@@ -0,0 +1,197 @@
+import argparse
+import json
+import multiprocessing
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+from augmentation.character_augmentation import SimpleCharacterBasedAugmentation
+from augmentation.segment_augmentation import SimpleSegmentBasedAugmentation
+from benchmarks.synthetic import generate_corpus
+from dataset import Dataset, Mappings
+from utils import to_json, to_tsv
+
+try:
+    import resource
+except ImportError:  # Not available on Windows
+    resource = None
+
+SEGMENT_STRATEGIES = {
+    "swap_first_last": lambda augment, rng, index: augment.random_swap_first_last_segment_tokens(rng=rng),
+    "remove_left_neighbor": lambda augment, rng, index: augment.random_remove_entity_neighbor(rng=rng),
+    "remove_right_neighbor": lambda augment, rng, index: augment.random_remove_entity_neighbor(left=False, right=True,
+                                                                                               rng=rng),
+    "remove_surrounding_neighbors": lambda augment, rng, index: augment.random_remove_entity_neighbor(right=True,
+                                                                                                      rng=rng),
+    "label_wise_replacement": lambda augment, rng, index: augment.label_wise_token_replacement(index, rng=rng),
+    "shuffle_in_entity": lambda augment, rng, index: augment.shuffle_within_entity_segment(rng=rng),
+    "shuffle_in_segments": lambda augment, rng, index: augment.shuffle_within_segments(rng=rng),
+}
+
+CHARACTER_STRATEGIES = {
+    "reverse_letter_case": lambda augment, rng: augment.random_reverse_letter_case(rng=rng),
+    "delete_character": lambda augment, rng: augment.random_delete_character(rng=rng),
+    "shuffle_characters_in_token": lambda augment, rng: augment.random_shuffle_chars_in_token(rng=rng),
+}
+
+
+BASELINE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "baseline.json")
+
+
+def get_peak_rss():
+    """
+    :return: Peak resident set size of the current process in MB, or None if unavailable
+    """
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1 << 20) if sys.platform == "darwin" else peak / (1 << 10)
+
+
+def timed(function, repeat: int = 1):
+    """
+    :return: Best wall time of repeated calls in seconds and the result of the last call
+    """
+    best, result = None, None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = function()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best, result
+
+
+def benchmark_scale(n_sentences: int, n_tag_columns: int = 1, repeat: int = 3, seed: int = 0):
+    """
+    Time every stage on a synthetic corpus of the given size
+    :return: Dictionary of stage names to {"seconds", "sentences_per_sec"} and the peak RSS of the process
+    """
+    results = {}
+
+    def record(stage, seconds):
+        results[stage] = {"seconds": seconds, "sentences_per_sec": n_sentences / seconds if seconds else None}
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        corpus_path = f"{tmp_dir}/corpus.tsv"
+        generate_corpus(corpus_path, n_sentences=n_sentences, n_tag_columns=n_tag_columns, seed=seed)
+
+        seconds, sequences = timed(lambda: Dataset(corpus_path, 0, *range(1, n_tag_columns + 1)).read_tsv_to_list(),
+                                   repeat)
+        record("parse", seconds)
+        seconds, _ = timed(lambda: Mappings(sequences).map_labels_to_tokens(1), repeat)
+        record("map_labels_to_tokens", seconds)
+        label_token_index = Mappings(sequences).get_label_token_index(1)
+
+        for name, strategy in SEGMENT_STRATEGIES.items():
+            def run_segment_strategy():
+                rng = np.random.default_rng(seed)
+                for sequence in sequences:
+                    strategy(SimpleSegmentBasedAugmentation(sequence[0], sequence[1]), rng, label_token_index)
+            record(name, timed(run_segment_strategy, repeat)[0])
+
+        for name, strategy in CHARACTER_STRATEGIES.items():
+            def run_character_strategy():
+                rng = np.random.default_rng(seed)
+                for sequence in sequences:
+                    strategy(SimpleCharacterBasedAugmentation(sequence[0], sequence[1]), rng)
+            record(name, timed(run_character_strategy, repeat)[0])
+
+        record("to_tsv", timed(lambda: to_tsv(f"{tmp_dir}/out.tsv", sequences), repeat)[0])
+        record("to_json", timed(lambda: to_json(f"{tmp_dir}/out.json", sequences), repeat)[0])
+    return {"stages": results, "peak_rss_mb": get_peak_rss()}
+
+
+def _benchmark_scale_worker(queue, kwargs):
+    queue.put(benchmark_scale(**kwargs))
+
+
+def run_benchmarks(scales, n_tag_columns: int = 1, repeat: int = 3, seed: int = 0):
+    """
+    Run benchmarks for each scale in a fresh process, so peak RSS is measured per scale
+    :param scales: List of numbers of sentences
+    :return: Dictionary of scale to results
+    """
+    context = multiprocessing.get_context("spawn")
+    results = {}
+    for n_sentences in scales:
+        queue = context.Queue()
+        process = context.Process(target=_benchmark_scale_worker,
+                                  args=(queue, {"n_sentences": n_sentences, "n_tag_columns": n_tag_columns,
+                                                "repeat": repeat, "seed": seed}))
+        process.start()
+        results[str(n_sentences)] = queue.get()
+        process.join()
+    return results
+
+
+def compare_to_baseline(results: dict, baseline: dict, tolerance: float = 0.2):
+    """
+    :param results: Current results
+    :param baseline: Stored results
+    :param tolerance: Allowed relative throughput loss
+    :return: List of (scale, stage, current sentences/sec, baseline sentences/sec) of regressed stages
+    """
+    regressions = []
+    for scale, scale_results in results.items():
+        baseline_stages = baseline.get(scale, {}).get("stages", {})
+        for stage, stage_results in scale_results["stages"].items():
+            if stage not in baseline_stages:
+                continue
+            current, previous = stage_results["sentences_per_sec"], baseline_stages[stage]["sentences_per_sec"]
+            if current is not None and previous and current < (1 - tolerance) * previous:
+                regressions.append((scale, stage, current, previous))
+    return regressions
+
+
+def print_results(results: dict, baseline: dict = None):
+    for scale, scale_results in results.items():
+        print(f"\n{scale} sentences\tpeak RSS: {scale_results['peak_rss_mb']:.1f} MB")
+        print(f"{'stage':<32}{'seconds':>12}{'sentences/sec':>16}{'vs baseline':>14}")
+        baseline_stages = (baseline or {}).get(scale, {}).get("stages", {})
+        for stage, stage_results in scale_results["stages"].items():
+            # Throughput is None for stages too fast to be timed
+            sentences_per_sec = stage_results["sentences_per_sec"]
+            change = ""
+            if sentences_per_sec is not None and stage in baseline_stages and \
+                    baseline_stages[stage]["sentences_per_sec"]:
+                change = f"{sentences_per_sec / baseline_stages[stage]['sentences_per_sec']:.2f}x"
+            throughput = "-" if sentences_per_sec is None else f"{sentences_per_sec:.0f}"
+            print(f"{stage:<32}{stage_results['seconds']:>12.4f}{throughput:>16}{change:>14}")
+
+
+def arguments():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--scales", type=int, nargs="+", default=[1000, 10000, 100000],
+                        help="Numbers of sentences of synthetic corpora")
+    parser.add_argument("--tag-columns", type=int, default=1)
+    parser.add_argument("--repeat", type=int, default=3, help="Number of repetitions, the best time is reported")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", type=str, default=None, help="Path to write results as JSON")
+    parser.add_argument("--baseline", type=str, default=BASELINE_PATH,
+                        help="Path to stored results to compare against, if it exists")
+    parser.add_argument("--save-baseline", action="store_true", help="Store results as new baseline")
+    parser.add_argument("--tolerance", type=float, default=0.2,
+                        help="Allowed relative throughput loss before a stage counts as regressed")
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    args = arguments()
+    results = run_benchmarks(args.scales, n_tag_columns=args.tag_columns, repeat=args.repeat, seed=args.seed)
+    baseline = None
+    if args.baseline is not None and os.path.isfile(args.baseline):
+        with open(args.baseline, "r", encoding="utf-8") as in_f:
+            baseline = json.load(in_f)
+    print_results(results, baseline)
+    for output in [args.output] + ([args.baseline] if args.save_baseline else []):
+        if output is not None:
+            with open(output, "w", encoding="utf-8") as out_f:
+                json.dump(results, out_f, indent=2)
+    if baseline is not None and not args.save_baseline:
+        regressions = compare_to_baseline(results, baseline, args.tolerance)
+        for scale, stage, current, previous in regressions:
+            print(f"Regression: {stage} at {scale} sentences: {current:.0f} vs {previous:.0f} sentences/sec")
+        sys.exit(1 if regressions else 0)
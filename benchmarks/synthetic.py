@@ -0,0 +1,75 @@
+import argparse
+
+import numpy as np
+
+
+def generate_corpus(output_path: str,
+                    n_sentences: int = 10000,
+                    mean_length: float = 15.0,
+                    entity_density: float = 0.15,
+                    n_tag_columns: int = 1,
+                    labels=("PER", "LOC", "ORG", "MISC"),
+                    max_entity_length: int = 3,
+                    vocab_size: int = 20000,
+                    seed: int = 0):
+    """
+    Write a seeded synthetic corpus in CoNLL format: a word column followed by BIO tag columns, with
+    "# newdoc id" / "# sent_id" comment lines and sentences separated by empty lines.
+    :param output_path: Path to output file
+    :param n_sentences: Number of sentences
+    :param mean_length: Mean sentence length. Lengths are Poisson distributed and at least 1
+    :param entity_density: Probability that an entity span starts at a token
+    :param n_tag_columns: Number of tag columns. Further columns refine the labels of the first one
+    :param labels: Entity labels
+    :param max_entity_length: Maximum number of tokens of an entity span
+    :param vocab_size: Number of distinct context words, drawn Zipf-like
+    :param seed: Random seed
+    :return: Number of tokens written
+    """
+    rng = np.random.default_rng(seed)
+    lengths = np.maximum(rng.poisson(mean_length, size=n_sentences), 1)
+    n_tokens = 0
+    with open(output_path, "w", encoding="utf-8") as out_f:
+        out_f.write("# newdoc id = synthetic\n")
+        for sent_id, length in enumerate(lengths.tolist()):
+            out_f.write(f"# sent_id = {sent_id}\n")
+            # Draw randomness for the whole sentence at once
+            starts = (rng.random(length) < entity_density).tolist()
+            span_lengths = rng.integers(1, max_entity_length + 1, size=length).tolist()
+            span_labels = rng.integers(len(labels), size=length).tolist()
+            words = (rng.zipf(1.3, size=length) % vocab_size).tolist()
+            lines = []
+            i = 0
+            while i < length:
+                if starts[i]:
+                    label = labels[span_labels[i]]
+                    for k in range(min(span_lengths[i], length - i)):
+                        prefix = "B" if k == 0 else "I"
+                        tags = [f"{prefix}-{label}"] + [f"{prefix}-{label}-{column}" for column in
+                                                         range(1, n_tag_columns)]
+                        lines.append(f"{label}{words[i + k]}\t" + "\t".join(tags) + "\n")
+                    i += min(span_lengths[i], length - i)
+                else:
+                    lines.append(f"w{words[i]}\t" + "\t".join(["O"] * n_tag_columns) + "\n")
+                    i += 1
+            out_f.writelines(lines)
+            out_f.write("\n")
+            n_tokens += length
+    return n_tokens
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--output-path", type=str)
+    parser.add_argument("--n-sentences", type=int, default=10000)
+    parser.add_argument("--mean-length", type=float, default=15.0)
+    parser.add_argument("--entity-density", type=float, default=0.15)
+    parser.add_argument("--tag-columns", type=int, default=1)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    generate_corpus(args.output_path,
+                    n_sentences=args.n_sentences,
+                    mean_length=args.mean_length,
+                    entity_density=args.entity_density,
+                    n_tag_columns=args.tag_columns,
+                    seed=args.seed)
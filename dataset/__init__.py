@@ -1,3 +1,8 @@
 from dataset.dataset import Dataset
 from dataset.mapping import Mappings
-from dataset.segmentation import SequenceSegmentation
+from dataset.segmentation import SequenceSegmentation, Spans, CorpusSpans, SegmentCombinations
+from dataset.corpus import Corpus
+from dataset.columnar import ColumnarCorpus, Vocabulary
+from dataset.similarity_cache import SimilarityCache
+from dataset.ann import IVFIndex
+from dataset.label_index import LabelTokenIndex
@@ -0,0 +1,151 @@
+import math
+import time
+from typing import List
+
+import numpy as np
+
+from dataset.similarity import SimilarityIndex
+
+
+class IVFIndex(SimilarityIndex):
+    """
+    Approximate top-n cosine similarity search using an inverted file index.
+    Normalised vectors are clustered with spherical k-means into n_lists coarse cells. A query only scores the tokens
+    of its n_probe most similar cells, so n_probe trades recall (higher) against speed (lower).
+    """
+
+    def __init__(self,
+                 tokens: List[str],
+                 vectors: np.ndarray,
+                 n_lists: int = None,
+                 n_probe: int = 8,
+                 n_iter: int = 10,
+                 max_training_size: int = 256,
+                 seed: int = 0,
+                 max_batch_scores: int = 1 << 24):
+        """
+        :param tokens: Vocabulary
+        :param vectors: Word vectors of shape (len(tokens), dim). Tokens with empty vectors are dropped.
+        :param n_lists: Number of coarse cells. Default: square root of vocabulary size
+        :param n_probe: Number of cells scored per query
+        :param n_iter: Number of k-means iterations
+        :param max_training_size: Maximum number of training vectors per cell used for k-means
+        :param seed: Random seed for k-means
+        :param max_batch_scores: Maximum number of scores computed at once
+        """
+        super().__init__(tokens, vectors, max_batch_scores=max_batch_scores)
+        self.n_lists = max(1, min(len(self.tokens), n_lists or round(math.sqrt(len(self.tokens)))))
+        self.n_probe = n_probe
+        rng = np.random.default_rng(seed)
+        self.centroids = self._train_centroids(rng, n_iter, max_training_size)
+        assignments = self._assign(self.matrix)
+        # Store cell members contiguously: cell i covers list_ids[list_offsets[i]:list_offsets[i + 1]]
+        self.list_ids = np.argsort(assignments, kind="stable")
+        self.list_offsets = np.concatenate([[0], np.cumsum(np.bincount(assignments, minlength=self.n_lists))])
+        self.list_matrix = self.matrix[self.list_ids]  # Vectors in cell order, so that cells are contiguous views
+
+    def _train_centroids(self, rng: np.random.Generator, n_iter: int, max_training_size: int):
+        """
+        Spherical k-means on a random subset of the normalised vectors
+        """
+        if len(self.tokens) == 0:
+            return np.zeros((0, self.matrix.shape[1]), dtype=np.float32)
+        n_training = min(len(self.tokens), self.n_lists * max_training_size)
+        training = self.matrix[rng.choice(len(self.tokens), size=n_training, replace=False)]
+        centroids = training[rng.choice(n_training, size=self.n_lists, replace=False)].copy()
+        for _ in range(n_iter):
+            assignments = np.argmax(training @ centroids.T, axis=1)
+            order = np.argsort(assignments, kind="stable")
+            counts = np.bincount(assignments, minlength=self.n_lists)
+            starts = np.concatenate([[0], np.cumsum(counts)[:-1]])
+            sums = np.zeros_like(centroids)
+            sums[counts > 0] = np.add.reduceat(training[order], starts[counts > 0], axis=0)
+            norms = np.linalg.norm(sums, axis=1)
+            empty = norms == 0
+            # Re-seed empty cells with random training vectors
+            sums[empty] = training[rng.choice(n_training, size=int(empty.sum()))]
+            norms[empty] = 1
+            centroids = sums / norms[:, None]
+        return centroids
+
+    def _assign(self, vectors: np.ndarray):
+        """
+        :return: Id of most similar centroid for each vector
+        """
+        assignments = np.empty(len(vectors), dtype=np.int64)
+        chunk_size = max(1, self.max_batch_scores // max(1, self.n_lists))
+        for start in range(0, len(vectors), chunk_size):
+            assignments[start:start + chunk_size] = np.argmax(vectors[start:start + chunk_size] @ self.centroids.T,
+                                                              axis=1)
+        return assignments
+
+    def top_n_batch(self, queries: np.ndarray, n: int = 5, exclude: List[str] = None):
+        """
+        Approximate top-n neighbours for a batch of queries
+        :param queries: Query vectors of shape (n_queries, dim)
+        :param n: Number of neighbours
+        :param exclude: Tokens which should not be returned for the corresponding query
+        :return: List of neighbour lists, one for each query
+        """
+        queries = np.asarray(queries, dtype=np.float32)
+        exclude = [None] * len(queries) if exclude is None else exclude
+        if n <= 0 or len(self.tokens) == 0 or queries.shape[1] != self.matrix.shape[1]:
+            return [[] for _ in queries]
+
+        norms = np.linalg.norm(queries, axis=1)
+        queries = queries / np.where(norms > 0, norms, 1)[:, None]
+        n_probe = min(self.n_probe, self.n_lists)
+        probed_cells = self._select_top_k(queries @ self.centroids.T, k=n_probe)[0]
+        results = []
+        for query, norm, cells, excluded in zip(queries, norms.tolist(), probed_cells, exclude):
+            if norm == 0:  # Query token has no word vector
+                results.append([])
+                continue
+            cell_ranges = [(self.list_offsets[cell], self.list_offsets[cell + 1]) for cell in cells.tolist()]
+            candidates = np.concatenate([self.list_ids[start:end] for start, end in cell_ranges])
+            scores = np.concatenate([self.list_matrix[start:end] @ query for start, end in cell_ranges])
+            top_ids, top_scores = self._select_top_k(scores[None, :], k=min(n + 1, len(candidates)))
+            neighbours = [(self.tokens[i], sim) for i, sim in zip(candidates[top_ids[0]].tolist(),
+                                                                  top_scores[0].tolist())
+                          if self.tokens[i] != excluded]
+            results.append(neighbours[:n])
+        return results
+
+
+def recall_at_n(exact: List[List[str]], approximate: List[List[str]]):
+    """
+    :param exact: Exact neighbour lists
+    :param approximate: Approximate neighbour lists for the same queries
+    :return: Mean fraction of exact neighbours found by the approximate search
+    """
+    recalls = [len(set(true) & set(found)) / len(true) for true, found in zip(exact, approximate) if true]
+    return sum(recalls) / len(recalls) if recalls else 1.0
+
+
+if __name__ == "__main__":
+    # Benchmark recall@n and query speed of IVF index against the exact engine on clustered random vectors
+    rng = np.random.default_rng(0)
+    N_TOKENS, DIM, N_QUERIES, N = 200000, 300, 500, 10
+    centers = rng.normal(size=(1000, DIM)).astype(np.float32)
+    noise = 1.5 * rng.normal(size=(N_TOKENS, DIM)).astype(np.float32)
+    vectors = centers[rng.integers(0, len(centers), N_TOKENS)] + noise
+    tokens = [f"token_{i}" for i in range(N_TOKENS)]
+    query_ids = rng.choice(N_TOKENS, size=N_QUERIES, replace=False)
+    queries, query_tokens = vectors[query_ids], [tokens[i] for i in query_ids]
+
+    exact_index = SimilarityIndex(tokens, vectors)
+    start = time.perf_counter()
+    exact_results = [[token for token, _ in neighbours]
+                     for neighbours in exact_index.top_n_batch(queries, n=N, exclude=query_tokens)]
+    print(f"exact\t{N_QUERIES / (time.perf_counter() - start):.1f} queries/s")
+
+    start = time.perf_counter()
+    ivf_index = IVFIndex(tokens, vectors)
+    print(f"IVF build with {ivf_index.n_lists} lists: {time.perf_counter() - start:.1f}s")
+    for n_probe in (1, 4, 8, 16, 32, 64):
+        ivf_index.n_probe = n_probe
+        start = time.perf_counter()
+        ivf_results = [[token for token, _ in neighbours]
+                       for neighbours in ivf_index.top_n_batch(queries, n=N, exclude=query_tokens)]
+        print(f"n_probe={n_probe}\t{N_QUERIES / (time.perf_counter() - start):.1f} queries/s\t"
+              f"recall@{N}={recall_at_n(exact_results, ivf_results):.3f}")
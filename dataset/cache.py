@@ -0,0 +1,109 @@
+import hashlib
+import json
+import os
+import shutil
+from typing import Tuple
+
+import numpy as np
+
+from dataset.columnar import ColumnarCorpus, Vocabulary
+
+CACHE_FORMAT_VERSION = 1
+_ARRAYS = ("token_ids", "tag_ids", "offsets")
+_VOCABS = ("token_vocab", "label_vocab")
+
+
+def hash_file(inp_path: str, chunk_size: int = 1 << 24):
+    """
+    :param inp_path: Path to file
+    :param chunk_size: Number of bytes read at once
+    :return: Hex digest of file content
+    """
+    digest = hashlib.blake2b(digest_size=20)
+    with open(inp_path, "rb") as inp_f:
+        while chunk := inp_f.read(chunk_size):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def get_cache_dir(inp_path: str, words_col: int, tags_col: Tuple[int, ...], comment_prefixes: Tuple[str, ...]):
+    """
+    Return cache directory next to input file. Each column / comment prefixes setting gets its own directory.
+    """
+    settings = json.dumps([words_col, list(tags_col), list(comment_prefixes)])
+    settings_digest = hashlib.blake2b(settings.encode("utf-8"), digest_size=8).hexdigest()
+    return f"{inp_path}.cache/{settings_digest}"
+
+
+def get_cache_key(inp_path: str, words_col: int, tags_col: Tuple[int, ...], comment_prefixes: Tuple[str, ...]):
+    """
+    Build cache key from file content and parsing settings
+    """
+    return {"version": CACHE_FORMAT_VERSION,
+            "content_hash": hash_file(inp_path),
+            "words_col": words_col,
+            "tags_col": list(tags_col),
+            "comment_prefixes": list(comment_prefixes)}
+
+
+def save_corpus_cache(cache_dir: str, store: ColumnarCorpus, key: dict):
+    """
+    Write columnar corpus to cache directory. The directory is written to a temporary location first and swapped in
+    afterwards, so that concurrent readers never see a partially written cache. If another process installs a valid
+    cache first, it is kept and the temporary copy discarded.
+    :param cache_dir: Cache directory
+    :param store: Columnar corpus
+    :param key: Cache key
+    """
+    tmp_dir = f"{cache_dir}.tmp-{os.getpid()}"
+    os.makedirs(tmp_dir, exist_ok=True)
+    for name in _ARRAYS:
+        np.save(os.path.join(tmp_dir, f"{name}.npy"), getattr(store, name))
+    for name in _VOCABS:
+        # Tokens and labels are whitespace separated in the input file and therefore never contain line breaks
+        with open(os.path.join(tmp_dir, f"{name}.txt"), "w", encoding="utf-8") as vocab_f:
+            vocab_f.write("\n".join(getattr(store, name).items))
+    with open(os.path.join(tmp_dir, "meta.json"), "w", encoding="utf-8") as meta_f:
+        json.dump(key, meta_f)
+    if read_cache_key(cache_dir) != key:
+        shutil.rmtree(cache_dir, ignore_errors=True)
+        try:
+            os.replace(tmp_dir, cache_dir)
+            return
+        except OSError:
+            # Another process installed its cache in the meantime, which is loaded instead
+            pass
+    shutil.rmtree(tmp_dir, ignore_errors=True)
+
+
+def read_cache_key(cache_dir: str):
+    """
+    :return: Key of cache in cache directory, None if there is none
+    """
+    try:
+        with open(os.path.join(cache_dir, "meta.json"), "r", encoding="utf-8") as meta_f:
+            return json.load(meta_f)
+    except (OSError, ValueError):
+        return None
+
+
+def load_corpus_cache(cache_dir: str, key: dict, mmap_mode: str = "r"):
+    """
+    Load columnar corpus from cache directory
+    :param cache_dir: Cache directory
+    :param key: Expected cache key
+    :param mmap_mode: Memory-map mode for id arrays. None to load them into memory
+    :return: Columnar corpus or None if cache is missing or stale
+    """
+    if read_cache_key(cache_dir) != key:
+        return None
+    try:
+        arrays = {name: np.load(os.path.join(cache_dir, f"{name}.npy"), mmap_mode=mmap_mode) for name in _ARRAYS}
+        vocabs = {}
+        for name in _VOCABS:
+            with open(os.path.join(cache_dir, f"{name}.txt"), "r", encoding="utf-8") as vocab_f:
+                content = vocab_f.read()
+            vocabs[name] = Vocabulary(content.split("\n") if content else [])
+    except (OSError, ValueError):
+        return None
+    return ColumnarCorpus(**arrays, **vocabs)
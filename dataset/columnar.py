@@ -0,0 +1,182 @@
+from array import array
+from collections.abc import Sequence as SequenceABC
+from typing import Iterable, List, Sequence
+
+import numpy as np
+
+from dataset.segmentation import CorpusSpans
+
+
+class Vocabulary:
+    """
+    Intern strings to contiguous integer ids
+    """
+
+    def __init__(self, items: Iterable[str] = ()):
+        self.items = []
+        self.ids = {}
+        for item in items:
+            self.add(item)
+
+    def __len__(self):
+        return len(self.items)
+
+    def __getitem__(self, item_id: int):
+        return self.items[item_id]
+
+    def __contains__(self, item: str):
+        return item in self.ids
+
+    def add(self, item: str):
+        """
+        Return id of item and add it to the vocabulary if it's unseen
+        """
+        item_id = self.ids.get(item)
+        if item_id is None:
+            item_id = len(self.items)
+            self.ids[item] = item_id
+            self.items.append(item)
+        return item_id
+
+    def decode(self, item_ids: np.ndarray):
+        """
+        :param item_ids: Array of item ids
+        :return: List of strings
+        """
+        return list(map(self.items.__getitem__, item_ids.tolist()))
+
+
+class ColumnarCorpus(SequenceABC):
+    """
+    Interned, columnar corpus representation.
+    Tokens and tags of all sentences are stored as flat int32 id arrays, while sentence boundaries are kept in a
+    CSR-style offsets array: sentence i spans token_ids[offsets[i]:offsets[i + 1]].
+    """
+
+    def __init__(self,
+                 token_ids: np.ndarray,
+                 tag_ids: np.ndarray,
+                 offsets: np.ndarray,
+                 token_vocab: Vocabulary,
+                 label_vocab: Vocabulary):
+        """
+        :param token_ids: Token ids of shape (n_tokens,)
+        :param tag_ids: Tag ids of shape (n_tag_columns, n_tokens)
+        :param offsets: Sentence offsets of shape (n_sentences + 1,)
+        :param token_vocab: Vocabulary of tokens
+        :param label_vocab: Vocabulary of labels shared by all tag columns
+        """
+        self.token_ids = token_ids
+        self.tag_ids = tag_ids
+        self.offsets = offsets
+        self.token_vocab = token_vocab
+        self.label_vocab = label_vocab
+
+    @classmethod
+    def from_sentences(cls, sentences: Iterable[List[List[str]]]):
+        """
+        Build columnar corpus from a stream of [[tokens], [tags_col_1], ...] sequences
+        :param sentences: Iterable of sequences
+        """
+        token_vocab, label_vocab = Vocabulary(), Vocabulary()
+        token_ids = array("i")
+        tag_ids = None
+        offsets = array("q", [0])
+        for sequence in sentences:
+            if tag_ids is None:
+                tag_ids = [array("i") for _ in sequence[1:]]
+            token_ids.extend(map(token_vocab.add, sequence[0]))
+            for column, tags in zip(tag_ids, sequence[1:]):
+                column.extend(map(label_vocab.add, tags))
+            offsets.append(len(token_ids))
+        tag_ids = [] if tag_ids is None else tag_ids
+        return cls(token_ids=np.frombuffer(token_ids, dtype=np.int32).copy(),
+                   tag_ids=np.array([np.frombuffer(column, dtype=np.int32) for column in tag_ids],
+                                    dtype=np.int32).reshape(len(tag_ids), len(token_ids)),
+                   offsets=np.frombuffer(offsets, dtype=np.int64).copy(),
+                   token_vocab=token_vocab,
+                   label_vocab=label_vocab)
+
+    def __len__(self):
+        """ Return number of sentences"""
+        return len(self.offsets) - 1
+
+    def __getitem__(self, index: int):
+        """ Return decoded sentence as [[tokens], [tags_col_1], ...]"""
+        token_ids, tag_ids = self.get_ids(index)
+        return [self.token_vocab.decode(token_ids)] + [self.label_vocab.decode(column) for column in tag_ids]
+
+    def __iter__(self):
+        for index in range(len(self)):
+            yield self[index]
+
+    def get_ids(self, index: int):
+        """
+        :param index: Sentence index
+        :return: Views of token ids and tag ids of the given sentence
+        """
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError(f"Sentence index {index} out of range")
+        start, end = self.offsets[index], self.offsets[index + 1]
+        return self.token_ids[start:end], self.tag_ids[:, start:end]
+
+    def get_lengths(self):
+        """ Return array of sentence lengths"""
+        return np.diff(self.offsets)
+
+    def get_label_mask(self, predicate):
+        """
+        :param predicate: Function deciding whether a label string should be selected
+        :return: Boolean array over label ids
+        """
+        return np.fromiter((predicate(label) for label in self.label_vocab.items),
+                           dtype=bool,
+                           count=len(self.label_vocab))
+
+    def get_entity_mask(self, tag_column: int = 0):
+        """
+        Vectorized lookup of sentences containing at least one "B-" label
+        :param tag_column: Index of tag column, relative to the tag columns
+        :return: Boolean array over sentences
+        """
+        if len(self) == 0:
+            return np.zeros(0, dtype=bool)
+        is_begin = self.get_label_mask(lambda label: "B-" in label)
+        return np.logical_or.reduceat(is_begin[self.tag_ids[tag_column]], self.offsets[:-1])
+
+    def get_spans(self, tag_column: int = 0):
+        """
+        Vectorized decoding of BIO spans of all sentences
+        :param tag_column: Index of tag column, relative to the tag columns
+        :return: CorpusSpans
+        """
+        return CorpusSpans.from_label_ids(self.tag_ids[tag_column], self.offsets, self.label_vocab.items)
+
+    def select(self, indices: Sequence[int]):
+        """
+        :param indices: Sentence indices
+        :return: Lazy sequence of decoded sentences
+        """
+        return SentenceView(self, indices)
+
+
+class SentenceView(SequenceABC):
+    """
+    Lazy sequence over a subset of sentences of a columnar corpus, decoding sentences on access
+    """
+
+    def __init__(self, corpus: ColumnarCorpus, indices: Sequence[int]):
+        self.corpus = corpus
+        self.indices = indices
+
+    def __len__(self):
+        return len(self.indices)
+
+    def __getitem__(self, index: int):
+        return self.corpus[self.indices[index]]
+
+    def __iter__(self):
+        for index in self.indices:
+            yield self.corpus[index]
@@ -0,0 +1,63 @@
+from typing import Set, Tuple
+
+from dataset.dataset import Dataset
+from dataset.mapping import Mappings
+from dataset.similarity_cache import SimilarityCache
+from utils.metrics import Metrics
+
+
+class Corpus:
+    """
+    Parsed corpus and label mappings, loaded once and shared by every augmentation run
+    """
+
+    def __init__(self,
+                 input_path: str,
+                 word_column: int,
+                 tag_columns: Set[int] | int,
+                 main_entity_column: int = None,
+                 spacy_model: str = "de_core_news_md",
+                 comment_prefixes: Tuple[str, ...] = None,
+                 columnar: bool = False,
+                 cache: bool = False,
+                 similarity_cache_path: str = None,
+                 ann_threshold: int = None,
+                 n_probe: int = 8,
+                 ):
+        """
+        :param input_path: Path to input file
+        :param word_column: Index for word column
+        :param tag_columns: Indices for tag columns
+        :param main_entity_column: Index of main entity column for multi-columns tagging. Default: 1
+        :param spacy_model: Name of spaCy model used for similarity mappings
+        :param comment_prefixes: Prefixes of comment / metadata lines to skip. Default: Dataset defaults
+        :param columnar: Whether to keep the corpus in an interned, columnar store
+        :param cache: Whether to cache the columnar store next to the input file. Implies columnar
+        :param similarity_cache_path: Path to sqlite file persisting nearest neighbours across runs
+        :param ann_threshold: Labels with more tokens than this use approximate nearest neighbour search
+        :param n_probe: Number of IVF cells scored per approximate query
+        """
+        self.tag_columns = {tag_columns} if int == type(tag_columns) else tag_columns
+        self.main_entity_column = 1 if main_entity_column is None else main_entity_column
+        self.metrics = Metrics()  # Wall time of loading stages
+        dataset_kwargs = {"columnar": columnar, "cache": cache}
+        if comment_prefixes is not None:
+            dataset_kwargs["comment_prefixes"] = comment_prefixes
+        with self.metrics.stage("parse"):
+            self.dataset = Dataset(input_path, word_column, *self.tag_columns, **dataset_kwargs)
+            self.all_sequences = self.dataset.read_tsv_to_list()
+        with self.metrics.stage("entity_sequences"):
+            self.entity_sequences = self.dataset()
+        with self.metrics.stage("mappings"):
+            self.mappings = Mappings(self.all_sequences,
+                                     spacy_model=spacy_model,
+                                     similarity_cache=SimilarityCache(db_path=similarity_cache_path),
+                                     ann_threshold=ann_threshold,
+                                     n_probe=n_probe,
+                                     metrics=self.metrics)
+            self.label_token_index = self.mappings.get_label_token_index(self.main_entity_column)
+            self.labels_to_tokens_mapping = self.label_token_index.to_mapping()
+
+    def __len__(self):
+        """ Return number of sequences in corpus"""
+        return len(self.all_sequences)
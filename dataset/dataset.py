@@ -1,14 +1,36 @@
+from operator import itemgetter
+from typing import Tuple
+
 import numpy as np
-import itertools
+
+from dataset.cache import get_cache_dir, get_cache_key, load_corpus_cache, save_corpus_cache
+from dataset.columnar import ColumnarCorpus
 
 
 class Dataset:
-    def __init__(self, inp_path: str, words_col: int, *tags_col: int):
+    def __init__(self,
+                 inp_path: str,
+                 words_col: int,
+                 *tags_col: int,
+                 comment_prefixes: Tuple[str, ...] = ("# newdoc id", "# sent_id"),
+                 columnar: bool = False,
+                 cache: bool = False):
+        """
+        :param inp_path: Path to CoNLL-like input file
+        :param words_col: Index of words column
+        :param tags_col: Indices of tag columns
+        :param comment_prefixes: Prefixes of comment / metadata lines which should be skipped
+        :param columnar: Whether sequences should be kept in an interned, columnar store instead of lists of strings
+        :param cache: Whether the columnar store should be cached next to the input file and memory-mapped on reload.
+        Implies columnar
+        """
         self.inp_path = inp_path
         self.words_col = words_col
         self.tags_col = tags_col
-        with open(inp_path, "r", encoding="utf-8") as inp_f:
-            self.lines = inp_f.readlines()
+        self.comment_prefixes = tuple(comment_prefixes)
+        self.columnar = columnar or cache
+        self.cache = cache
+        self._corpus = None
 
     def __len__(self):
         """ Return number of entity sequences in corpus"""
@@ -16,29 +38,81 @@ class Dataset:
 
     def __call__(self):
         """ Return list of entity sequences"""
+        if self.columnar:
+            return self.store.select(np.flatnonzero(self.store.get_entity_mask()))
         return [entity_seq for entity_seq in self.get_entity_sequence()]
 
+    @property
+    def store(self) -> ColumnarCorpus:
+        """ Columnar store of parsed sequences. Only available if dataset is columnar"""
+        if not self.columnar:
+            raise AttributeError("Dataset was not created with columnar=True")
+        return self.read_tsv_to_list()
+
     def get_entity_sequence(self):
         """
         Yield sequences with annotated entities only
         """
+        if self.columnar:
+            yield from self()
+            return
         for _, sequence in enumerate(self.read_tsv_to_list()):
             if any("B-" in label for label in sequence[1]):
                 yield sequence
 
     def read_tsv_to_list(self):
-        corpus = []
-        sequence = []
-        for _, line in enumerate(self.lines):
-            # TODO: Revise this part, since it's not suitable for other corpora
-            if not line.startswith("# newdoc id") and not line.startswith("# sent_id"):
-                current_line = line.strip()
-                if current_line != "":
-                    split_line = current_line.split()
-                    sequence.append(list(itertools.chain.from_iterable([[split_line[self.words_col]],
-                                                                        [split_line[i] for i in self.tags_col]])))
-                else:
-                    sequence = np.transpose(np.array(sequence)).tolist()
-                    corpus.append(sequence)
-                    sequence = []
-        return corpus
+        """
+        Parse input file once and memoize the result.
+        :return: List of sequences, each as [[tokens], [tags_col_1], ...].
+        If dataset is columnar, a ColumnarCorpus which decodes sequences into the same form on access.
+        """
+        if self._corpus is None:
+            if self.cache:
+                self._corpus = self.load_cached_store()
+            elif self.columnar:
+                self._corpus = ColumnarCorpus.from_sentences(self.iter_sentences())
+            else:
+                self._corpus = list(self.iter_sentences())
+        return self._corpus
+
+    def load_cached_store(self):
+        """
+        Load columnar store from on-disk cache. Cache is (re)built if it's missing or stale, i.e. if content of input
+        file or parsing settings changed.
+        :return: Memory-mapped columnar store. The store built in memory, if a concurrent writer replaced the cache
+        before it could be loaded
+        """
+        cache_dir = get_cache_dir(self.inp_path, self.words_col, self.tags_col, self.comment_prefixes)
+        key = get_cache_key(self.inp_path, self.words_col, self.tags_col, self.comment_prefixes)
+        store = load_corpus_cache(cache_dir, key)
+        if store is None:
+            built = ColumnarCorpus.from_sentences(self.iter_sentences())
+            save_corpus_cache(cache_dir, built, key)
+            store = load_corpus_cache(cache_dir, key)
+            if store is None:
+                store = built
+        return store
+
+    def iter_sentences(self):
+        """
+        Stream sentences from input file without loading it into memory.
+        Sentences are separated by empty lines and lines starting with one of the comment prefixes are skipped.
+        :return: Generator of sequences, each as [[tokens], [tags_col_1], ...]
+        """
+        columns = (self.words_col,) + self.tags_col
+        get_columns = itemgetter(*columns) if len(columns) > 1 else lambda split_line: (split_line[columns[0]],)
+        sequence = [[] for _ in columns]
+        with open(self.inp_path, "r", encoding="utf-8") as inp_f:
+            for line in inp_f:
+                if self.comment_prefixes and line.startswith(self.comment_prefixes):
+                    continue
+                split_line = line.split()
+                if split_line:
+                    for column, value in zip(sequence, get_columns(split_line)):
+                        column.append(value)
+                elif sequence[0]:
+                    yield sequence
+                    sequence = [[] for _ in columns]
+        # Last sequence might not be followed by an empty line
+        if sequence[0]:
+            yield sequence
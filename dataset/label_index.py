@@ -0,0 +1,65 @@
+from typing import Dict, Iterable, List
+
+import numpy as np
+
+
+class LabelTokenIndex:
+    """
+    Label to tokens index with token frequencies.
+    Tokens of each label are kept as a list together with a cumulative frequency array, so that uniform and
+    frequency-weighted draws are O(1) and O(log n) respectively.
+    """
+
+    def __init__(self, counts: Dict[str, Dict[str, int]]):
+        """
+        :param counts: Token frequencies per label, in order of first occurrence
+        """
+        self.counts = counts
+        self.tokens = {label: list(token_counts) for label, token_counts in counts.items()}
+        self.cumulative = {label: np.cumsum(np.fromiter(token_counts.values(), dtype=np.int64,
+                                                        count=len(token_counts)))
+                           for label, token_counts in counts.items()}
+
+    @classmethod
+    def from_sequences(cls, sequences: Iterable[List[List[str]]], entity_column: int = 1):
+        """
+        Build index in a single linear pass over the corpus
+        :param sequences: Iterable of [[tokens], [tags_col_1], ...] sequences
+        :param entity_column: Index of entity column
+        """
+        counts = {}
+        for sequence in sequences:
+            for token, label in zip(sequence[0], sequence[entity_column]):
+                token_counts = counts.get(label)
+                if token_counts is None:
+                    token_counts = counts[label] = {}
+                token_counts[token] = token_counts.get(token, 0) + 1
+        return cls(counts)
+
+    def __contains__(self, label: str):
+        return label in self.tokens
+
+    def __getitem__(self, label: str):
+        """ Return list of unique tokens of the given label"""
+        return self.tokens[label]
+
+    def to_mapping(self):
+        """
+        :return: Dictionary of labels to lists of unique tokens
+        """
+        return self.tokens
+
+    def sample(self, label: str, random_state=np.random, weighted: bool = False):
+        """
+        Draw a token of the given label
+        :param label: Label
+        :param random_state: numpy.random module or Generator providing random()
+        :param weighted: Whether tokens should be drawn proportional to their frequency instead of uniformly
+        :return: Token
+        """
+        tokens = self.tokens[label]
+        if weighted:
+            cumulative = self.cumulative[label]
+            position = int(np.searchsorted(cumulative, random_state.random() * cumulative[-1], side="right"))
+            return tokens[min(position, len(tokens) - 1)]
+        return tokens[min(int(random_state.random() * len(tokens)), len(tokens) - 1)]
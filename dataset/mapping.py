@@ -1,74 +1,179 @@
 from .dataset import Dataset
 
+from .ann import IVFIndex
+from .label_index import LabelTokenIndex
+from .similarity import SimilarityIndex
+from .similarity_cache import SimilarityCache
+
+from functools import lru_cache
 from typing import List
-import spacy
+
+from utils.metrics import Metrics
+
+import numpy as np
+
+
+@lru_cache(maxsize=None)
+def load_spacy_model(spacy_model: str):
+    """
+    Import spaCy and load the given model. Models are cached process-wide by name.
+    :param spacy_model: Name of spaCy model
+    :return: Loaded spaCy pipeline
+    """
+    import spacy
+    return spacy.load(spacy_model)
 
 
 class Mappings:
     # TODO: Finish commenting this part
-    def __init__(self, inp_dataset: List[List[str]], spacy_model: str = "de_core_news_md"):
+    def __init__(self, inp_dataset: List[List[str]], spacy_model: str = "de_core_news_md",
+                 similarity_cache: SimilarityCache = None, ann_threshold: int = None, n_probe: int = 8,
+                 metrics: Metrics = None):
+        """
+        :param inp_dataset: List of sequences
+        :param spacy_model: Name of spaCy model used for word vectors
+        :param similarity_cache: Cache of label-wise nearest neighbours. Default: in-memory cache
+        :param ann_threshold: Labels with more tokens than this use an approximate (IVF) index. None: always exact
+        :param n_probe: Number of IVF cells scored per query. Higher values trade speed for recall
+        :param metrics: Metrics recording the time spent loading the spaCy model
+        """
         self.inp_dataset = inp_dataset
-        self.model = spacy.load(spacy_model)
+        self.spacy_model = spacy_model
+        self.similarity_cache = SimilarityCache() if similarity_cache is None else similarity_cache
+        self.ann_threshold = ann_threshold
+        self.n_probe = n_probe
+        self.metrics = Metrics() if metrics is None else metrics
+        # Approximate neighbours are cached separately from exact ones
+        self.cache_model_key = spacy_model if ann_threshold is None else f"{spacy_model}:ivf-{ann_threshold}-{n_probe}"
+        self.label_token_indices = {}  # Memoized labels to tokens index per entity column
+        self.similarity_indices = {}  # Similarity index per entity column and label
+        self.validated_labels = set()  # Labels whose cached neighbours were checked against their vocabulary
+
+    @property
+    def model(self):
+        """ spaCy model, which is only imported and loaded once a similarity method is used"""
+        if load_spacy_model.cache_info().currsize:
+            return load_spacy_model(self.spacy_model)
+        with self.metrics.stage("spacy_load"):
+            return load_spacy_model(self.spacy_model)
+
+    def map_entity_to_distribution(self, entity_column: int = 1):
+        """
+        Map entity labels to the frequencies of their tokens in corpus (ignore 'O')
+        :param entity_column: Index of entity column
+        :return: Dictionary of labels to dictionaries of token frequencies
+        """
+        return {label: token_counts for label, token_counts in self.get_label_token_index(entity_column).counts.items()
+                if label != "O"}
 
-    def map_entity_to_distribution(self):
-        pass
-        # TODO: Map entities to their distribution in corpus (ignore 'O')
+    def get_label_token_index(self, entity_column: int = 1):
+        """
+        Return labels to tokens index with token frequencies. The index is built once per entity column.
+        :param entity_column: Index of entity column
+        :return: LabelTokenIndex
+        """
+        if entity_column not in self.label_token_indices:
+            self.label_token_indices[entity_column] = LabelTokenIndex.from_sequences(self.inp_dataset, entity_column)
+        return self.label_token_indices[entity_column]
 
     def map_labels_to_tokens(self, entity_column: int = 1):
         """
         Create labels to tokens mapping. This mapping will be utilised for label-wise and similarity-wise replacements.
-        :return:
-        """
-        labels_to_tokens_mappings = {}
-        for anno in self.inp_dataset:
-            for seq, tag in zip(anno[0], anno[entity_column]):
-                if tag not in labels_to_tokens_mappings.keys():
-                    labels_to_tokens_mappings.update({tag: [seq]})
-                else:
-                    if seq not in labels_to_tokens_mappings[tag]:
-                        labels_to_tokens_mappings[tag].append(seq)
-        return labels_to_tokens_mappings
-
-    def map_tokens_to_similarity_scores(self, inp_word: str, vocabs_list: List[str]):
+        :return: Dictionary of labels to lists of unique tokens
         """
+        return self.get_label_token_index(entity_column).to_mapping()
 
-        :param inp_word:
-        :param vocabs_list:
-        :return:
+    def get_vectors(self, words: List[str]):
         """
-        inp_vocab = self.model(inp_word)
-        # Create a list of spacy vocabularies with valid word vector( i.e., word vector is not empty)
-        spacy_vocabularies = [self.model(word) for word in vocabs_list if self.model(word).vector_norm]
+        Look up word vectors in spaCy vocabulary without running the pipeline
+        :param words: List of words
+        :return: Array of shape (len(words), vector width). Words without vector get a zero vector.
+        """
+        vocab = self.model.vocab
+        if not words:
+            return np.zeros((0, vocab.vectors_length), dtype=np.float32)
+        return np.array([vocab.get_vector(word) for word in words], dtype=np.float32)
 
-        # Compute similarity between inp word and tokens from vocabs list using out-of-the-shelf spaCy model
-        tokens_to_similarities_mapping = {}
-        for vocab in spacy_vocabularies:
-            tokens_to_similarities_mapping.update({str(vocab): inp_vocab.similarity(vocab)})
+    def get_similarity_index(self, label: str, entity_column: int = 1):
+        """
+        Return similarity index over all tokens of the given label. Indices are built once on first use.
+        :param label: Entity label
+        :param entity_column: Index of entity column the labels to tokens mapping is built from
+        :return: SimilarityIndex
+        """
+        key = (entity_column, label)
+        if key not in self.similarity_indices:
+            tokens = self.map_labels_to_tokens(entity_column).get(label, [])
+            index = self.build_similarity_index(tokens)
+            if self.ann_threshold is not None and len(index) > self.ann_threshold:
+                index = IVFIndex(index.tokens, index.matrix, n_probe=self.n_probe)
+            self.similarity_indices[key] = index
+        return self.similarity_indices[key]
+
+    def build_similarity_index(self, vocabs_list: List[str]):
+        """
+        :param vocabs_list: List of candidate tokens
+        :return: SimilarityIndex over candidate tokens with valid word vectors
+        """
+        return SimilarityIndex(vocabs_list, self.get_vectors(vocabs_list))
 
-        # Sort mapping by similarity scores
-        sorted_mappings = {vocabulary: sim for vocabulary, sim in sorted(
-            tokens_to_similarities_mapping.items(),
-            key=lambda sim: sim[1],
-            reverse=True
-        )
-                           }
-        return sorted_mappings
+    def map_tokens_to_similarity_scores(self, inp_word: str, vocabs_list: List[str]):
+        """
+        Compute similarity between input word and tokens from vocabs list
+        :param inp_word: Input word
+        :param vocabs_list: List of candidate tokens
+        :return: Mapping of candidate tokens with valid word vectors to their similarity, sorted by similarity
+        """
+        index = self.build_similarity_index(vocabs_list)
+        return dict(index.top_n(self.get_vectors([inp_word])[0], n=len(index)))
 
-    def get_top_n_similarities(self, inp_word: str, vocabs_list: List[str], n: int = 5):
+    def get_top_n_similarities(self, inp_word: str, vocabs_list: List[str] = None, n: int = 5, label: str = None,
+                               entity_column: int = 1):
+        """
+        Return top n most similar tokens to the input word, without the input word itself
+        :param inp_word: Input word
+        :param vocabs_list: List of candidate tokens. Ignored if label is given
+        :param n: Number of similar tokens
+        :param label: Use precomputed similarity index of all tokens of this label as candidates
+        :param entity_column: Index of entity column for label-wise candidates
+        :return: List of similar tokens sorted by similarity
         """
+        return self.get_top_n_similarities_batch([inp_word], vocabs_list, n=n, label=label,
+                                                 entity_column=entity_column)[0]
 
-        :param inp_word:
-        :param vocabs_list:
-        :param n:
-        :return:
+    def get_top_n_similarities_batch(self, inp_words: List[str], vocabs_list: List[str] = None, n: int = 5,
+                                     label: str = None, entity_column: int = 1):
+        """
+        Batched version of get_top_n_similarities computing all queries in one matrix-matrix product.
+        Label-wise queries are served from the similarity cache first, only missing words are computed.
+        :return: List of lists of similar tokens, one for each input word
+        """
+        if label is None:
+            return self.compute_top_n_similarities(self.build_similarity_index(vocabs_list), inp_words, n)
+
+        if (entity_column, label) not in self.validated_labels:
+            self.similarity_cache.validate(self.cache_model_key, entity_column, label,
+                                           self.map_labels_to_tokens(entity_column).get(label, []))
+            self.validated_labels.add((entity_column, label))
+        similarities = self.similarity_cache.get_many(self.cache_model_key, entity_column, label, inp_words, n)
+        missing_words = list(dict.fromkeys(word for word, similar in zip(inp_words, similarities) if similar is None))
+        if missing_words:
+            computed = dict(zip(missing_words, self.compute_top_n_similarities(
+                self.get_similarity_index(label, entity_column), missing_words, n)))
+            self.similarity_cache.put_many(self.cache_model_key, entity_column, label, list(computed.items()), n)
+            similarities = [computed[word] if similar is None else similar
+                            for word, similar in zip(inp_words, similarities)]
+        return similarities
+
+    def compute_top_n_similarities(self, index: SimilarityIndex, inp_words: List[str], n: int = 5):
+        """
+        :param index: Similarity index of candidate tokens
+        :param inp_words: Input words
+        :param n: Number of similar tokens
+        :return: List of lists of similar tokens, one for each input word
         """
-        list_of_top_similarities = list(self.map_tokens_to_similarity_scores(inp_word, vocabs_list=vocabs_list).keys())
-        # Remove word from list of top similarities to avoid duplication
-        try:
-            list_of_top_similarities.remove(inp_word)
-        except ValueError:
-            return list_of_top_similarities[:n]
-        return list_of_top_similarities[:n]
+        neighbours = index.top_n_batch(self.get_vectors(inp_words), n=n, exclude=inp_words)
+        return [[token for token, _ in word_neighbours] for word_neighbours in neighbours]
 
 
 if __name__ == "__main__":
@@ -86,6 +191,6 @@ if __name__ == "__main__":
 
     token = "Hanami"
     # tokens_to_sim_scores_mappings = mappings.map_tokens_to_similarity_scores(token, relevant_tokens)
-    top_n_similarities = mappings.get_top_n_similarities(token, relevant_tokens, n=6)
+    top_n_similarities = mappings.get_top_n_similarities(token, label="B-nat-name", n=6)
     print(top_n_similarities)
     print()
@@ -1,45 +1,283 @@
-from typing import List
-from itertools import combinations
+import sys
+from math import comb
+from typing import List, Sequence
+
+import numpy as np
+
+
+class Spans:
+    """
+    Entity spans of a sentence, decoded once from its BIO labels.
+    Span i covers the tokens [starts[i], ends[i]) and is labelled labels[i]. Tokens labelled neither "B-" nor "I-"
+    are treated as outside tokens.
+    """
+    __slots__ = ("starts", "ends", "labels", "is_begin", "length")
+
+    def __init__(self, starts: Sequence[int], ends: Sequence[int], labels: Sequence[str], is_begin: Sequence[bool],
+                 length: int):
+        """
+        :param starts: Start position of each span
+        :param ends: End position (exclusive) of each span
+        :param labels: Entity label of each span, without BIO prefix
+        :param is_begin: Whether a span starts with a "B-" label
+        :param length: Number of tokens of the sentence
+        """
+        self.starts = starts
+        self.ends = ends
+        self.labels = labels
+        self.is_begin = is_begin
+        self.length = length
+
+    @classmethod
+    def from_labels(cls, labels: List[str]):
+        """
+        Decode spans in a single pass over the labels.
+        A span ends before the next "O" or "B-" label, so "I-" labels directly after "O" start a new span.
+        :param labels: BIO labels of a sentence
+        """
+        starts, ends, span_labels, is_begin = [], [], [], []
+        start = None
+        for i, label in enumerate(labels):
+            prefix = label[:2]
+            if prefix == "B-" or prefix == "I-":
+                if start is not None and prefix == "B-":
+                    ends.append(i)
+                    start = None
+                if start is None:
+                    start = i
+                    starts.append(i)
+                    span_labels.append(label[2:])
+                    is_begin.append(prefix == "B-")
+            elif start is not None:
+                ends.append(i)
+                start = None
+        if start is not None:
+            ends.append(len(labels))
+        return cls(starts, ends, span_labels, is_begin, len(labels))
+
+    def __len__(self):
+        return len(self.starts)
+
+    def __iter__(self):
+        return zip(self.starts, self.ends, self.labels)
+
+    def get_boundaries(self):
+        """
+        Boundaries of tags based segments: outside tokens are split from the following span if it starts with "B-",
+        and every span is split from the tokens following it.
+        :return: Sorted list of segment boundaries including 0 and the sentence length
+        """
+        boundaries = {0, self.length}
+        for start, end, is_begin in zip(self.starts, self.ends, self.is_begin):
+            if is_begin:
+                boundaries.add(start)
+            boundaries.add(end)
+        return sorted(boundaries)
+
+
+class CorpusSpans:
+    """
+    Entity spans of all sentences of a corpus in flat arrays. Spans of sentence i are
+    starts[span_offsets[i]:span_offsets[i + 1]], with positions relative to the corpus.
+    """
+    __slots__ = ("starts", "ends", "label_ids", "is_begin", "span_offsets", "offsets", "label_types")
+
+    def __init__(self, starts: np.ndarray, ends: np.ndarray, label_ids: np.ndarray, is_begin: np.ndarray,
+                 span_offsets: np.ndarray, offsets: np.ndarray, label_types: List[str]):
+        self.starts = starts
+        self.ends = ends
+        self.label_ids = label_ids
+        self.is_begin = is_begin
+        self.span_offsets = span_offsets
+        self.offsets = offsets
+        self.label_types = label_types
+
+    @classmethod
+    def from_label_ids(cls, label_ids: np.ndarray, offsets: np.ndarray, label_vocab: Sequence[str]):
+        """
+        Vectorized decoding of int-coded BIO labels of a whole corpus
+        :param label_ids: Label ids of all tokens of shape (n_tokens,)
+        :param offsets: Sentence offsets of shape (n_sentences + 1,)
+        :param label_vocab: Label string of each label id
+        """
+        prefixes = [label[:2] for label in label_vocab]
+        label_types = sorted({label[2:] for label, prefix in zip(label_vocab, prefixes) if prefix in ("B-", "I-")})
+        type_ids = {label_type: i for i, label_type in enumerate(label_types)}
+        is_b_id = np.array([prefix == "B-" for prefix in prefixes], dtype=bool)
+        is_i_id = np.array([prefix == "I-" for prefix in prefixes], dtype=bool)
+        type_of_id = np.array([type_ids.get(label[2:], -1) for label in label_vocab], dtype=np.int32)
+
+        is_b, is_i = is_b_id[label_ids], is_i_id[label_ids]
+        is_entity = is_b | is_i
+        n_tokens = len(label_ids)
+        is_first = np.zeros(n_tokens, dtype=bool)
+        is_first[offsets[:-1][offsets[:-1] < n_tokens]] = True
+        is_last = np.zeros(n_tokens, dtype=bool)
+        is_last[offsets[1:][offsets[1:] > 0] - 1] = True
+        prev_entity = np.zeros(n_tokens, dtype=bool)
+        prev_entity[1:] = is_entity[:-1]
+        next_i = np.zeros(n_tokens, dtype=bool)
+        next_i[:-1] = is_i[1:]
+
+        starts = np.flatnonzero(is_entity & (is_first | ~prev_entity | is_b))
+        ends = np.flatnonzero(is_entity & (is_last | ~next_i)) + 1
+        return cls(starts=starts,
+                   ends=ends,
+                   label_ids=type_of_id[label_ids[starts]],
+                   is_begin=is_b[starts],
+                   span_offsets=np.searchsorted(starts, offsets),
+                   offsets=offsets,
+                   label_types=label_types)
+
+    def __len__(self):
+        """ Return number of sentences"""
+        return len(self.offsets) - 1
+
+    def __getitem__(self, index: int):
+        """ Return spans of a sentence with positions relative to the sentence"""
+        first, last = self.span_offsets[index], self.span_offsets[index + 1]
+        offset = self.offsets[index]
+        return Spans(starts=(self.starts[first:last] - offset).tolist(),
+                     ends=(self.ends[first:last] - offset).tolist(),
+                     labels=[self.label_types[label_id] for label_id in self.label_ids[first:last].tolist()],
+                     is_begin=self.is_begin[first:last].tolist(),
+                     length=int(self.offsets[index + 1] - offset))
+
+
+class SegmentCombinations:
+    """
+    Lazy, seekable sequence of all non-empty subsets of k segments, in the order of itertools.combinations for
+    r = 1..k. Subsets are tuples of segment indices and are computed on access by unranking, never materialized.
+    """
+
+    def __init__(self, n_segments: int):
+        """
+        :param n_segments: Number of segments k
+        """
+        self.n_segments = n_segments
+        self.count = 2 ** n_segments - 1
+
+    def __len__(self):
+        """
+        Return number of subsets 2^k - 1, clamped to sys.maxsize since len() can't exceed it.
+        Use count for the exact number, which is larger for k > 62
+        """
+        return min(self.count, sys.maxsize)
+
+    def __getitem__(self, index: int):
+        """
+        Unrank a subset in O(k)
+        :param index: Rank of subset, negative ranks count from the end
+        :return: Tuple of segment indices
+        """
+        if index < 0:
+            index += self.count
+        if not 0 <= index < self.count:
+            raise IndexError(f"Combination index {index} out of range")
+        r = 1
+        while index >= comb(self.n_segments, r):
+            index -= comb(self.n_segments, r)
+            r += 1
+        subset = []
+        candidate = 0
+        while r > 0:
+            n_with_candidate = comb(self.n_segments - candidate - 1, r - 1)
+            if index < n_with_candidate:
+                subset.append(candidate)
+                r -= 1
+            else:
+                index -= n_with_candidate
+            candidate += 1
+        return tuple(subset)
+
+    def __iter__(self):
+        return self.iter_from(0)
+
+    def iter_from(self, start: int = 0):
+        """
+        Iterate lazily over subsets, starting at the given rank
+        :param start: Rank of first subset
+        :return: Generator of tuples of segment indices
+        """
+        if start >= self.count:
+            return
+        subset = list(self[start])
+        k = self.n_segments
+        while True:
+            yield tuple(subset)
+            r = len(subset)
+            # Lexicographic successor of subset among subsets of the same size
+            i = r - 1
+            while i >= 0 and subset[i] == k - r + i:
+                i -= 1
+            if i >= 0:
+                subset[i] += 1
+                for j in range(i + 1, r):
+                    subset[j] = subset[j - 1] + 1
+            elif r < k:
+                subset = list(range(r + 1))
+            else:
+                return
+
+    def sample(self, rng: np.random.Generator = None):
+        """
+        Draw a subset uniformly at random, by including each segment with probability 1/2 and rejecting empty subsets
+        :param rng: Random generator. Default: generator seeded with 0
+        :return: Tuple of segment indices
+        """
+        if self.n_segments == 0:
+            raise ValueError("Cannot sample a subset of zero segments")
+        rng = np.random.default_rng(0) if rng is None else rng
+        while True:
+            subset = np.flatnonzero(rng.random(self.n_segments) < 0.5)
+            if len(subset):
+                return tuple(subset.tolist())
 
 
 class SequenceSegmentation:
-    def __init__(self, sequence: List[str], labels: List[str]):
+    """
+    Segment views of a tokens sequence. Spans are decoded once on first use, so sequence and labels must not be
+    modified afterwards.
+    """
+
+    def __init__(self, sequence: List[str], labels: List[str], spans: Spans = None):
+        """
+        :param sequence: Tokens sequence
+        :param labels: BIO labels of the sequence
+        :param spans: Spans decoded beforehand, e.g. by CorpusSpans. Default: decoded from labels
+        """
         self.sequence = sequence
         self.labels = labels
+        self._spans = spans
+
+    @property
+    def spans(self):
+        if self._spans is None:
+            self._spans = Spans.from_labels(self.labels)
+        return self._spans
 
     def __len__(self):
-        """ Return number of segment combinations when len() is called"""
-        list_of_segments = [segment[0] for segment in self.get_annotated_segment()]
-        counter = 0
-        for i in range(1, len(list_of_segments) + 1):
-            for _ in combinations(list_of_segments, r=i):
-                counter += 1
-        return counter
+        """ Return number of segment combinations when len() is called, clamped to sys.maxsize. See count"""
+        return min(self.count, sys.maxsize)
+
+    @property
+    def count(self):
+        """ Exact number of segment combinations 2^k - 1, which exceeds the range of len() for k > 62"""
+        return self.get_segment_combinations().count
+
+    def get_segment_combinations(self):
+        """
+        :return: Lazy sequence of all non-empty subsets of annotated segments
+        """
+        return SegmentCombinations(len(self.spans))
 
     def get_tags_based_segments(self):
         """
         Split tokens sequence into different segments based on corresponding tags.
         :return: List of separated tokens segments
         """
-        segments = []
-        segment = []
-        for i, _ in enumerate(self.labels):
-            try:
-                if self.labels[i] == "O":
-                    segment.append(self.sequence[i])
-                    if self.labels[i + 1].startswith("B-"):
-                        segments.append(segment)
-                        segment = []
-                else:
-                    segment.append(self.sequence[i])
-                    if ((self.labels[i].startswith("I-")
-                         or self.labels[i].startswith("B-"))
-                            and not self.labels[i + 1].startswith("I-")):
-                        segments.append(segment)
-                        segment = []
-            except IndexError:
-                segments.append(segment)
-        return segments
+        boundaries = self.spans.get_boundaries()
+        return [self.sequence[start:end] for start, end in zip(boundaries, boundaries[1:])]
 
     def get_annotated_segment(self):
         """
@@ -47,20 +285,5 @@ class SequenceSegmentation:
         :return: List of segment tokens and list of position ids.
         E.g.: ["B-name", "I-name", "O", "O", "O"] --> ["Token_0", "Token_1"], [0, 1]
         """
-        span_tokens = []
-        positions = []
-        for i, _ in enumerate(self.labels):
-            try:
-                if (self.labels[i].startswith("B-") or
-                        self.labels[i].startswith("I-")
-                ):
-                    span_tokens.append(self.sequence[i])
-                    positions.append(i)
-                    if (self.labels[i + 1] == "O"
-                            or self.labels[i+1].startswith("B-")
-                    ):
-                        yield span_tokens, positions
-                        span_tokens, positions = [], []
-            except IndexError:
-                yield span_tokens, positions
-                span_tokens, positions = [], []
+        for start, end, _ in self.spans:
+            yield self.sequence[start:end], list(range(start, end))
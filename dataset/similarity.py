@@ -0,0 +1,81 @@
+from typing import List, Tuple
+
+import numpy as np
+
+
+class SimilarityIndex:
+    """
+    Exact top-n cosine similarity search over the word vectors of a fixed vocabulary, e.g. all tokens of one label.
+    Vectors are L2-normalised once, so that a query is a single matrix-vector product plus argpartition.
+    """
+
+    def __init__(self, tokens: List[str], vectors: np.ndarray, max_batch_scores: int = 1 << 24):
+        """
+        :param tokens: Vocabulary
+        :param vectors: Word vectors of shape (len(tokens), dim). Tokens with empty vectors are dropped.
+        :param max_batch_scores: Maximum number of scores computed at once for a batch of queries
+        """
+        vectors = np.asarray(vectors, dtype=np.float32)
+        norms = np.linalg.norm(vectors, axis=1)
+        valid = norms > 0
+        self.tokens = [token for token, is_valid in zip(tokens, valid.tolist()) if is_valid]
+        self.matrix = vectors[valid] / norms[valid, None]
+        self.max_batch_scores = max_batch_scores
+
+    def __len__(self):
+        return len(self.tokens)
+
+    def top_n(self, query: np.ndarray, n: int = 5, exclude: str = None):
+        """
+        :param query: Query vector
+        :param n: Number of neighbours
+        :param exclude: Token which should not be returned, usually the query token itself
+        :return: List of (token, similarity) tuples sorted by descending similarity
+        """
+        return self.top_n_batch(np.asarray(query)[None, :], n=n, exclude=[exclude])[0]
+
+    def top_n_batch(self, queries: np.ndarray, n: int = 5, exclude: List[str] = None):
+        """
+        Top-n neighbours for a batch of queries, computed as one matrix-matrix product per chunk of queries
+        :param queries: Query vectors of shape (n_queries, dim)
+        :param n: Number of neighbours
+        :param exclude: Tokens which should not be returned for the corresponding query
+        :return: List of neighbour lists, one for each query
+        """
+        queries = np.asarray(queries, dtype=np.float32)
+        exclude = [None] * len(queries) if exclude is None else exclude
+        if n <= 0 or len(self.tokens) == 0 or queries.shape[1] != self.matrix.shape[1]:
+            return [[] for _ in queries]
+
+        results = []
+        chunk_size = max(1, self.max_batch_scores // len(self.tokens))
+        for start in range(0, len(queries), chunk_size):
+            chunk = queries[start:start + chunk_size]
+            norms = np.linalg.norm(chunk, axis=1)
+            scores = (chunk / np.where(norms > 0, norms, 1)[:, None]) @ self.matrix.T
+            neighbour_ids, neighbour_scores = self._select_top_k(scores, k=min(n + 1, len(self.tokens)))
+            for norm, ids, sims, excluded in zip(norms.tolist(),
+                                                 neighbour_ids.tolist(),
+                                                 neighbour_scores.tolist(),
+                                                 exclude[start:start + chunk_size]):
+                if norm == 0:  # Query token has no word vector
+                    results.append([])
+                    continue
+                neighbours = [(self.tokens[i], sim) for i, sim in zip(ids, sims) if self.tokens[i] != excluded]
+                results.append(neighbours[:n])
+        return results
+
+    @staticmethod
+    def _select_top_k(scores: np.ndarray, k: int) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        :param scores: Similarity scores of shape (n_queries, n_tokens)
+        :param k: Number of best scores to keep per query
+        :return: Ids and scores of the k best tokens per query, sorted by descending score
+        """
+        if k < scores.shape[1]:
+            top_ids = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+        else:
+            top_ids = np.broadcast_to(np.arange(scores.shape[1]), scores.shape)
+        top_scores = np.take_along_axis(scores, top_ids, axis=1)
+        order = np.argsort(-top_scores, axis=1, kind="stable")
+        return np.take_along_axis(top_ids, order, axis=1), np.take_along_axis(top_scores, order, axis=1)
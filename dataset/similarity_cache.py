@@ -0,0 +1,175 @@
+import hashlib
+import json
+import sqlite3
+from collections import OrderedDict
+from typing import List, Tuple
+
+SCHEMA_VERSION = 2  # Stores of other versions are dropped and recreated
+
+
+class LRUCache:
+    """
+    Bounded in-memory least recently used cache
+    """
+
+    def __init__(self, max_size: int = 100000):
+        self.max_size = max_size
+        self.entries = OrderedDict()
+
+    def __len__(self):
+        return len(self.entries)
+
+    def get(self, key):
+        """
+        :return: Cached value or None
+        """
+        value = self.entries.get(key)
+        if value is not None:
+            self.entries.move_to_end(key)
+        return value
+
+    def put(self, key, value):
+        self.entries[key] = value
+        self.entries.move_to_end(key)
+        if len(self.entries) > self.max_size:
+            self.entries.popitem(last=False)
+
+    def clear(self):
+        self.entries.clear()
+
+    def evict(self, predicate):
+        """
+        Drop all entries whose key matches the predicate
+        """
+        for key in [key for key in self.entries if predicate(key)]:
+            del self.entries[key]
+
+
+def fingerprint_vocabulary(tokens: List[str]):
+    """
+    :param tokens: Vocabulary of a label
+    :return: Hex digest identifying the vocabulary
+    """
+    digest = hashlib.blake2b(digest_size=16)
+    for token in tokens:
+        digest.update(token.encode("utf-8"))
+        digest.update(b"\n")
+    return digest.hexdigest()
+
+
+class SimilarityCache:
+    """
+    Two-level nearest neighbour cache keyed by (model name, entity column, label, token, n).
+    A bounded in-memory LRU sits in front of an optional sqlite store. Stored neighbours of a label are invalidated
+    as soon as the vocabulary of that label in that entity column changes.
+    """
+
+    def __init__(self, db_path: str = None, max_size: int = 100000):
+        """
+        :param db_path: Path to sqlite file. None to keep the in-memory level only
+        :param max_size: Maximum number of entries kept in memory
+        """
+        self.db_path = db_path
+        self.memory = LRUCache(max_size=max_size)
+        self.fingerprints = {}  # Vocabulary fingerprint per (model, entity column, label) validated against the store
+        self.hits = 0
+        self.misses = 0
+        self.connection = None
+        self.connect()
+
+    def connect(self):
+        """
+        Open sqlite store and create tables if necessary
+        """
+        if self.db_path is not None:
+            self.connection = sqlite3.connect(self.db_path, timeout=60)
+            if self.connection.execute("PRAGMA user_version").fetchone()[0] != SCHEMA_VERSION:
+                with self.connection:
+                    self.connection.execute("DROP TABLE IF EXISTS vocabularies")
+                    self.connection.execute("DROP TABLE IF EXISTS neighbours")
+                    self.connection.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+            self.connection.execute("CREATE TABLE IF NOT EXISTS vocabularies "
+                                    "(model TEXT, entity_column INTEGER, label TEXT, fingerprint TEXT, "
+                                    "PRIMARY KEY (model, entity_column, label))")
+            self.connection.execute("CREATE TABLE IF NOT EXISTS neighbours "
+                                    "(model TEXT, entity_column INTEGER, label TEXT, token TEXT, n INTEGER, "
+                                    "neighbours TEXT, PRIMARY KEY (model, entity_column, label, token, n))")
+            self.connection.commit()
+
+    def validate(self, model: str, entity_column: int, label: str, tokens: List[str]):
+        """
+        Drop cached neighbours of the label if its vocabulary differs from the one they were computed for
+        :param model: Name of spaCy model
+        :param entity_column: Index of entity column of the label
+        :param label: Entity label
+        :param tokens: Current vocabulary of the label
+        """
+        fingerprint = fingerprint_vocabulary(tokens)
+        scope = (model, entity_column, label)
+        if self.fingerprints.get(scope) == fingerprint:
+            return
+        if scope in self.fingerprints:
+            self.memory.evict(lambda key: key[:3] == scope)
+        self.fingerprints[scope] = fingerprint
+        if self.connection is None:
+            return
+        row = self.connection.execute("SELECT fingerprint FROM vocabularies "
+                                      "WHERE model = ? AND entity_column = ? AND label = ?", scope).fetchone()
+        if row is None or row[0] != fingerprint:
+            with self.connection:
+                self.connection.execute("DELETE FROM neighbours WHERE model = ? AND entity_column = ? AND label = ?",
+                                        scope)
+                self.connection.execute("INSERT OR REPLACE INTO vocabularies VALUES (?, ?, ?, ?)",
+                                        (*scope, fingerprint))
+
+    def get_many(self, model: str, entity_column: int, label: str, tokens: List[str], n: int):
+        """
+        :return: List of cached neighbour lists, None for tokens which are not cached
+        """
+        results = [self.memory.get((model, entity_column, label, token, n)) for token in tokens]
+        missing = [i for i, result in enumerate(results) if result is None]
+        if missing and self.connection is not None:
+            for i in missing:
+                row = self.connection.execute("SELECT neighbours FROM neighbours WHERE model = ? AND "
+                                              "entity_column = ? AND label = ? AND token = ? AND n = ?",
+                                              (model, entity_column, label, tokens[i], n)).fetchone()
+                if row is not None:
+                    results[i] = json.loads(row[0])
+                    self.memory.put((model, entity_column, label, tokens[i], n), results[i])
+        n_hits = sum(result is not None for result in results)
+        self.hits += n_hits
+        self.misses += len(results) - n_hits
+        return results
+
+    def put_many(self, model: str, entity_column: int, label: str, items: List[Tuple[str, List[str]]], n: int):
+        """
+        :param items: List of (token, neighbours) tuples
+        """
+        for token, neighbours in items:
+            self.memory.put((model, entity_column, label, token, n), neighbours)
+        if self.connection is not None and items:
+            with self.connection:
+                self.connection.executemany("INSERT OR REPLACE INTO neighbours VALUES (?, ?, ?, ?, ?, ?)",
+                                            [(model, entity_column, label, token, n, json.dumps(neighbours))
+                                             for token, neighbours in items])
+
+    def reconnect(self):
+        """
+        Open a fresh connection, e.g. in a forked worker process. The inherited connection must not be used there.
+        """
+        self.connection = None
+        self.connect()
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        state["connection"] = None
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self.connect()
+
+    def close(self):
+        if self.connection is not None:
+            self.connection.close()
+            self.connection = None
@@ -1,8 +1,9 @@
 #!./venv/bin/python3
 import os
 
-from augmentation import Augmentation
-from dataset import to_tsv, to_json
+from augmentation import Sweep
+from dataset import Corpus
+from utils.metrics import profile
 
 import itertools
 import argparse
@@ -22,15 +23,91 @@ def arguments():
                         type=int,
                         default=1,
                         help="Specify the main task entity column.")
+    parser.add_argument("--comment-prefixes",
+                        type=str,
+                        nargs="*",
+                        default=None,
+                        help="Prefixes of comment / metadata lines to skip. Default: '# newdoc id' '# sent_id'")
+    parser.add_argument("--columnar",
+                        action="store_true",
+                        help="Keep the corpus in an interned, columnar store to reduce memory usage")
+    parser.add_argument("--cache",
+                        action="store_true",
+                        help="Cache the parsed corpus next to the input file and memory-map it on later runs. "
+                             "Implies --columnar")
     parser.add_argument("--segment-based-augmentation", action="store_true")
     parser.add_argument("--character-based-augmentation", action="store_true")
+    parser.add_argument("--similarity-based-augmentation",
+                        action="store_true",
+                        help="Replace tokens by similar tokens of the same label using spaCy word vectors")
+    parser.add_argument("--strategies",
+                        type=str,
+                        nargs="+",
+                        default=None,
+                        help="Further strategies to run. Strategies joined by '+' are applied one after another, "
+                             "e.g. shuffle_in_entity+reverse_letter_case")
+    parser.add_argument("--similarity-cache",
+                        type=str,
+                        default=None,
+                        help="Path to sqlite file caching nearest neighbours for similarity-based augmentation")
+    parser.add_argument("--result-cache",
+                        type=str,
+                        default=None,
+                        help="Path to sqlite file caching augmented samples by sentence content, so reruns on an "
+                             "updated corpus only augment new or changed sentences. Samples are then seeded by their "
+                             "content instead of their position")
+    parser.add_argument("--ann-threshold",
+                        type=int,
+                        default=None,
+                        help="Use approximate nearest neighbour search for labels with more tokens than this")
+    parser.add_argument("--n-probe",
+                        type=int,
+                        default=8,
+                        help="Number of index cells scored per approximate query. Higher is slower but more accurate")
     parser.add_argument("--p-augmentation",
                         type=float,
                         default=0.5,
                         help="Probability for for binomial distribution")
+    parser.add_argument("--weighted-replacement",
+                        action="store_true",
+                        help="Draw label-wise replacement tokens proportional to their corpus frequency")
+    parser.add_argument("--dedup",
+                        type=str,
+                        choices=["hash", "bloom"],
+                        default=None,
+                        help="Drop augmented sentences identical to any original or previously augmented sentence. "
+                             "'hash' is exact, 'bloom' uses a memory-bounded Bloom filter")
+    parser.add_argument("--dedup-error-rate",
+                        type=float,
+                        default=1e-6,
+                        help="False positive rate of the Bloom filter")
     parser.add_argument("--seed",
                         type=int,
                         default=42)
+    parser.add_argument("--workers",
+                        type=int,
+                        default=1,
+                        help="Number of worker processes augmenting the sampled sentences of a strategy")
+    parser.add_argument("--jobs",
+                        type=int,
+                        default=1,
+                        help="Number of strategy x sample ratio jobs running concurrently")
+    parser.add_argument("--resume",
+                        action="store_true",
+                        help="Skip jobs whose outputs were completed by a previous run with the same parameters and "
+                             "input file")
+    parser.add_argument("--nested-ratios",
+                        action="store_true",
+                        help="Augment each strategy once at the largest sample ratio and emit smaller ratios as "
+                             "nested prefixes")
+    parser.add_argument("--fused",
+                        action="store_true",
+                        help="Apply all strategies in a single pass over the sampled sentences")
+    parser.add_argument("--profile",
+                        action="store_true",
+                        help="Run corpus loading and each augmentation task under cProfile and tracemalloc and dump "
+                             "the results to <output-path>/profile, with one profile per strategy. "
+                             "Requires --workers 1, since worker processes are not profiled")
     parser.add_argument("--to-tsv", action="store_true")
     parser.add_argument("--to-json", action="store_true")
     parser.add_argument("--json-columns",
@@ -38,7 +115,20 @@ def arguments():
                         nargs="+",
                         default=None,
                         help="Optional columns for json file.")
-    return parser.parse_args()
+    parser.add_argument("--compact-json",
+                        action="store_true",
+                        help="Write compact UTF-8 JSON Lines, using orjson if installed")
+    parser.add_argument("--compress",
+                        action="store_true",
+                        help="Write gzip-compressed output files")
+    args = parser.parse_args()
+    if args.profile and args.workers > 1:
+        parser.error("--profile requires --workers 1, since worker processes are not profiled")
+    n_columns = 1 + len(args.tag_columns or [])
+    if args.to_json and args.json_columns is not None and len(args.json_columns) != n_columns:
+        parser.error(f"--json-columns needs one name for the word column and each of the {n_columns - 1} tag "
+                     f"column(s), {len(args.json_columns)} given")
+    return args
 
 
 if __name__ == "__main__":
@@ -52,7 +142,7 @@ if __name__ == "__main__":
     strategies = []
 
     if args.segment_based_augmentation:
-        strategies = [  # "swap_first_last",
+        strategies += [  # "swap_first_last",
             "remove_left_neighbor",
             "remove_right_neighbor",
             "remove_surrounding_neighbors",
@@ -60,42 +150,56 @@ if __name__ == "__main__":
             "shuffle_in_entity",
             "shuffle_in_segments"]
     if args.character_based_augmentation:
-        strategies = ["reverse_letter_case",
-                      "random_delete_character",
-                      "shuffle_characters_in_token"]
+        strategies += ["reverse_letter_case",
+                       "delete_character",
+                       "shuffle_characters_in_token"]
+    if args.similarity_based_augmentation:
+        strategies += ["similarity_entity_replacement",
+                       "similarity_context_replacement"]
+    if args.strategies:
+        strategies += [strategy for strategy in args.strategies if strategy not in strategies]
     SAMPLE_RATIO = [0.1, 0.2, 0.3, 0.4, 0.5, 0.6, 0.7, 1]
     N_ITERATION = 1
 
-    with open(f"./{args.output_path}/augmentation_stats.tsv", "w") as file:
-        file.write("strategy\tn_sentences_total\tn_entity_sentences\tn_samples\t"
-                   "n_iteration\tn_augmentation\tsample_ratio\taugmentation_ratio\ttotal_ratio\n")
-
-        for strategy, ratio in itertools.product(strategies, SAMPLE_RATIO):
-            augmentation = Augmentation(input_path=args.input_path,
-                                        word_column=args.word_column,
-                                        tag_columns=args.tag_columns,
-                                        main_entity_column=args.main_entity_column,
-                                        sample_ratio=ratio,
-                                        p_augmentation=args.p_augmentation,
-                                        n_iteration=N_ITERATION,
-                                        seed=args.seed
-                                        )
-            print(f"Create augmentation: \nStrategy: {strategy}\tSample Ratio: {ratio}\tN_iteration: {N_ITERATION}")
-            if args.segment_based_augmentation:
-                augmentation.word_based_augmentation(strategy=strategy)
-            if args.character_based_augmentation:
-                augmentation.character_based_augmentation(strategy=strategy)
+    if args.profile:
+        os.makedirs(f"{args.output_path}/profile", exist_ok=True)
 
-            augmented_data = augmentation.augmentation_samples
-            n_sentences, n_ent_sentences, n_samples, n_aug = augmentation.get_sizes()
+    # Parse corpus and build label mappings once for the whole strategy x sample ratio sweep
+    with profile(f"{args.output_path}/profile/corpus" if args.profile else None):
+        corpus = Corpus(input_path=args.input_path,
+                        word_column=args.word_column,
+                        tag_columns=args.tag_columns,
+                        main_entity_column=args.main_entity_column,
+                        comment_prefixes=args.comment_prefixes,
+                        columnar=args.columnar,
+                        cache=args.cache,
+                        similarity_cache_path=args.similarity_cache,
+                        ann_threshold=args.ann_threshold,
+                        n_probe=args.n_probe
+                        )
 
-            if args.output_path is not None:
-                if args.to_tsv:
-                    to_tsv(f"{args.output_path}/{strategy}-{ratio}-{N_ITERATION}.tsv", augmented_data)
-                if args.to_json:
-                    to_json(f"{args.output_path}/{strategy}-{ratio}-{N_ITERATION}.json", augmented_data,
-                            args.json_columns)
+    jobs = list(itertools.product(strategies, SAMPLE_RATIO))
 
-            file.write(f"{strategy}\t{n_sentences}\t{n_ent_sentences}\t{n_samples}\t"
-                       f"{N_ITERATION}\t{n_aug}\t{ratio}\t{n_aug / n_ent_sentences}\t{n_aug / n_sentences}\n"
-                       )
+    sweep = Sweep(corpus=corpus,
+                  jobs=jobs,
+                  output_path=args.output_path,
+                  n_iteration=N_ITERATION,
+                  augmentation_kwargs={"p_augmentation": args.p_augmentation,
+                                       "seed": args.seed,
+                                       "weighted_replacement": args.weighted_replacement,
+                                       "workers": args.workers,
+                                       "dedup": args.dedup,
+                                       "dedup_error_rate": args.dedup_error_rate,
+                                       "result_cache_path": args.result_cache},
+                  to_tsv=args.to_tsv,
+                  to_json=args.to_json,
+                  json_columns=args.json_columns,
+                  compact_json=args.compact_json,
+                  compress=args.compress,
+                  n_jobs=args.jobs,
+                  resume=args.resume,
+                  nested=args.nested_ratios,
+                  fused=args.fused,
+                  profile=args.profile
+                  )
+    sweep.run()
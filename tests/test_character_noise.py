@@ -0,0 +1,92 @@
+import math
+
+import numpy as np
+import pytest
+
+from augmentation import Augmentation
+from augmentation.character_augmentation import CharacterNoise
+from augmentation.random_state import get_sample_rng
+from dataset import Corpus
+
+OPERATIONS = ("reverse_letter_case", "delete_character", "shuffle_characters")
+STRATEGIES = ("reverse_letter_case", "delete_character", "shuffle_characters_in_token")
+
+SENTENCES = [["My", "name", "is", "Monkey", "D.", "Luffy", "."],
+             [],
+             ["Müller", "wohnt", "in", "der", "Straße", "nahe", "İstanbul", "."],
+             ["東京都", "に", "住む", "ÉCOLE", "naïve", "👍🏽ok", "x"],
+             ["I", "'", "m", "gonna", "be", "King", "of", "the", "Pirates"]]
+
+
+def get_rngs(seed: int, n: int):
+    return [get_sample_rng(seed, i) for i in range(n)]
+
+
+@pytest.mark.parametrize("operation", OPERATIONS)
+@pytest.mark.parametrize("p", [0.1, 0.5, 0.9])
+def test_batch_matches_single_sentences(operation, p):
+    noise = CharacterNoise(p=p)
+    batch = getattr(noise, operation)(SENTENCES, get_rngs(42, len(SENTENCES)))
+    single = [getattr(noise, operation)([sentence], [rng])[0]
+              for sentence, rng in zip(SENTENCES, get_rngs(42, len(SENTENCES)))]
+    assert batch == single
+    assert [len(sentence) for sentence in batch] == [len(sentence) for sentence in SENTENCES]
+
+
+@pytest.mark.parametrize("operation", OPERATIONS)
+def test_empty_batch(operation):
+    assert getattr(CharacterNoise(), operation)([], []) == []
+    assert getattr(CharacterNoise(), operation)([[]], get_rngs(0, 1)) == [[]]
+
+
+def test_shuffle_keeps_characters():
+    shuffled = CharacterNoise(p=0.9).shuffle_characters(SENTENCES, get_rngs(7, len(SENTENCES)))
+    for sentence, augmented in zip(SENTENCES, shuffled):
+        assert [sorted(token) for token in sentence] == [sorted(token) for token in augmented]
+
+
+def reference_edit(sentence, rng, p, min_length, edit):
+    """ Per-token implementation the engine replaced, for byte-identical case flips and deletions"""
+    tokens = []
+    for token, selected in zip(sentence, (rng.random(len(sentence)) < p).tolist()):
+        if selected and len(token) >= min_length:
+            token = edit(token, math.floor(p * (len(token) - 1)))
+        tokens.append(token)
+    return tokens
+
+
+@pytest.mark.parametrize("operation, min_length, edit", [
+    ("reverse_letter_case", 3, lambda token, i: token[:i] + (token[i].upper() if token[i].islower()
+                                                             else token[i].lower()) + token[i + 1:]),
+    ("delete_character", 2, lambda token, i: token[:i] + token[i + 1:]),
+])
+def test_matches_per_token_reference(operation, min_length, edit):
+    expected = [reference_edit(sentence, rng, 0.5, min_length, edit)
+                for sentence, rng in zip(SENTENCES, get_rngs(3, len(SENTENCES)))]
+    assert getattr(CharacterNoise(p=0.5), operation)(SENTENCES, get_rngs(3, len(SENTENCES))) == expected
+
+
+@pytest.fixture(scope="module")
+def corpus(tmp_path_factory):
+    path = tmp_path_factory.mktemp("corpus") / "corpus.tsv"
+    rng = np.random.default_rng(0)
+    words = ["Müller", "Straße", "東京都", "naïve", "ÉCOLE", "Luffy", "King", "of", "the", "a", ".", "👍🏽ok"]
+    with open(path, "w", encoding="utf-8") as out_f:
+        for _ in range(300):
+            n_tokens = int(rng.integers(2, 12))
+            for i, word in enumerate(rng.choice(words, size=n_tokens).tolist()):
+                tag = "B-PER" if i == 1 else "I-PER" if i == 2 else "O"
+                out_f.write(f"{word}\t{tag}\n")
+            out_f.write("\n")
+    return Corpus(input_path=str(path), word_column=0, tag_columns=[1])
+
+
+@pytest.mark.parametrize("workers", [1, 2])
+def test_augmentation_independent_of_chunk_size(corpus, workers):
+    results = []
+    for chunk_size in (1, 256):
+        augmentation = Augmentation(corpus, sample_ratio=1, n_iteration=3, workers=workers, chunk_size=chunk_size)
+        augmentation.run(list(STRATEGIES))
+        results.append([augmentation.get_sink(strategy).samples for strategy in STRATEGIES])
+    assert results[0] == results[1]
+    assert all(results[0])
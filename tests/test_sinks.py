@@ -0,0 +1,19 @@
+import json
+
+import pytest
+
+from augmentation.sinks import WriterSink
+from utils import JsonLinesWriter, TsvWriter
+
+
+def test_rejected_sample_written_to_no_writer(tmp_path):
+    tsv_path, json_path = str(tmp_path / "out.tsv"), str(tmp_path / "out.json")
+    sink = WriterSink([(TsvWriter(tsv_path), None), (JsonLinesWriter(json_path, columns=["tok", "ner"]), None)])
+    with pytest.warns(UserWarning, match="Skip sentence"):
+        sink.add([[["a", "b"], ["O", "B-X"]], [["c"], ["O"], ["O"]]])
+    sink.close()
+    assert sink.get_n_augmented() == 1
+    with open(tsv_path, encoding="utf-8") as tsv_f:
+        assert tsv_f.read() == "a\tO\nb\tB-X\n\n"
+    with open(json_path, encoding="utf-8") as json_f:
+        assert [json.loads(line) for line in json_f] == [{"tok": ["a", "b"], "ner": ["O", "B-X"]}]
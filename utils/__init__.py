@@ -1 +1,2 @@
 from utils.utils import to_json, to_tsv 
+from utils.writers import JsonLinesWriter, TsvWriter
@@ -1,25 +1,196 @@
 #!./venv/bin/python3
 
+import gzip
+import json
 import os
+import random
+import shutil
+import tempfile
 import argparse
+from concurrent.futures import ThreadPoolExecutor
+from typing import List
 
 
 def arguments():
     parser = argparse.ArgumentParser()
     parser.add_argument("--in-file")
     parser.add_argument("--path-to-aug")
+    parser.add_argument("--jobs",
+                        type=int,
+                        default=4,
+                        help="Number of files joined concurrently")
+    parser.add_argument("--shuffle",
+                        action="store_true",
+                        help="Shuffle sentences of original and augmented data, using bounded memory")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--bucket-size",
+                        type=int,
+                        default=1 << 26,
+                        help="Approximate number of bytes held in memory per shuffle bucket")
+    parser.add_argument("--manifest",
+                        action="store_true",
+                        help="Only describe joins in a manifest.json instead of copying the original corpus")
     return parser.parse_args()
 
 
+def copy_file(src_path: str, out_file):
+    """
+    Append file to an open binary output file, using zero-copy sendfile where available
+    :param src_path: Path to source file
+    :param out_file: Output file opened in binary mode
+    """
+    with open(src_path, "rb") as src_file:
+        if hasattr(os, "sendfile"):
+            out_file.flush()
+            size = os.fstat(src_file.fileno()).st_size
+            offset = 0
+            try:
+                while offset < size:
+                    sent = os.sendfile(out_file.fileno(), src_file.fileno(), offset, size - offset)
+                    if sent == 0:
+                        break
+                    offset += sent
+                return
+            except OSError:
+                if offset:
+                    raise
+        shutil.copyfileobj(src_file, out_file, 1 << 20)
+
+
+def get_aug_files(path_to_aug: str):
+    """
+    :return: Paths of augmented data files in folder, except augmentation stats and metrics
+    """
+    return sorted(f"{path_to_aug}/{file}" for file in os.listdir(path_to_aug)
+                  if os.path.isfile(f"{path_to_aug}/{file}") and not file.startswith("augmentation_"))
+
+
+def get_original(in_file: str, aug_file: str, tmp_dir: str):
+    """
+    Gzip-compressed augmented files are joined with a compressed copy of the original, since concatenated gzip
+    members form a valid gzip file. Plain augmented files are joined with a decompressed copy of a compressed original.
+    Each copy is created once in a temporary directory and shared by all joins.
+    :param in_file: Path to original data
+    :param aug_file: Path to augmented data
+    :param tmp_dir: Temporary directory which is removed once all joins are finished
+    :return: Path of original data matching the compression of the augmented file
+    """
+    if aug_file.endswith(".gz") == in_file.endswith(".gz"):
+        return in_file
+    if aug_file.endswith(".gz"):
+        copy, open_copy, open_src = f"{tmp_dir}/{os.path.basename(in_file)}.gz", gzip.open, open
+    else:
+        copy, open_copy, open_src = f"{tmp_dir}/{os.path.basename(in_file)[:-len('.gz')]}", open, gzip.open
+    if not os.path.isfile(copy):
+        with open_src(in_file, "rb") as src_file, open_copy(copy, "wb") as out_file:
+            shutil.copyfileobj(src_file, out_file, 1 << 20)
+    return copy
+
+
+def join_files(parts: List[str], out_path: str):
+    """
+    Stream files into the output file one after another, without reading them into memory
+    :param parts: Paths of files to join
+    :param out_path: Path to output file
+    """
+    with open(out_path, "wb") as out_file:
+        for part in parts:
+            copy_file(part, out_file)
+    return out_path
+
+
+def open_text(path: str):
+    return gzip.open(path, "rt", encoding="utf-8") if path.endswith(".gz") else open(path, "r", encoding="utf-8")
+
+
+def iter_records(paths: List[str]):
+    """
+    Iterate over records of files: lines of JSON Lines files and blank line separated sentences otherwise
+    :return: Generator of records, each ending with its separator
+    """
+    for path in paths:
+        json_lines = ".json" in os.path.basename(path)
+        with open_text(path) as in_f:
+            if json_lines:
+                for line in in_f:
+                    if line.strip():
+                        yield line if line.endswith("\n") else line + "\n"
+                continue
+            record = []
+            for line in in_f:
+                if line.strip():
+                    record.append(line if line.endswith("\n") else line + "\n")
+                elif record:
+                    yield "".join(record) + "\n"
+                    record = []
+            if record:
+                yield "".join(record) + "\n"
+
+
+def shuffle_files(parts: List[str], out_path: str, seed: int = 42, bucket_size: int = 1 << 26):
+    """
+    Shuffle records of several files into one output file with external memory: records are first scattered into
+    random bucket files, then each bucket is shuffled in memory. Memory is bounded by the size of a bucket.
+    :param parts: Paths of files to join
+    :param out_path: Path to output file
+    :param seed: Random seed
+    :param bucket_size: Approximate number of bytes per bucket
+    """
+    rng = random.Random(seed)
+    # Compressed parts are assumed to expand about four times
+    n_bytes = sum(os.path.getsize(part) * (4 if part.endswith(".gz") else 1) for part in parts)
+    n_buckets = max(1, -(-n_bytes // bucket_size))
+    out_dir = os.path.dirname(out_path) or "."
+    with tempfile.TemporaryDirectory(dir=out_dir, prefix=".shuffle-") as tmp_dir:
+        buckets = [open(f"{tmp_dir}/{i}", "w", encoding="utf-8") for i in range(n_buckets)]
+        for record in iter_records(parts):
+            # Records are separated by NUL to keep multi-line sentences together
+            buckets[rng.randrange(n_buckets)].write(record + "\0")
+        for bucket in buckets:
+            bucket.close()
+        with (gzip.open(out_path, "wt", encoding="utf-8") if out_path.endswith(".gz")
+              else open(out_path, "w", encoding="utf-8")) as out_f:
+            for i in range(n_buckets):
+                with open(f"{tmp_dir}/{i}", "r", encoding="utf-8") as bucket:
+                    records = bucket.read().split("\0")[:-1]
+                rng.shuffle(records)
+                out_f.writelines(records)
+    return out_path
+
+
+def write_manifest(in_file: str, aug_files: List[str], out_dir: str):
+    """
+    Describe each "original + augmentation" join as a list of parts, instead of copying the original corpus
+    :return: Path of manifest file
+    """
+    manifest = {os.path.basename(aug_file): {"parts": [os.path.abspath(in_file), os.path.abspath(aug_file)]}
+                for aug_file in aug_files}
+    manifest_path = f"{out_dir}/manifest.json"
+    with open(manifest_path, "w", encoding="utf-8") as out_f:
+        json.dump(manifest, out_f, indent=2)
+    return manifest_path
+
+
+def iter_manifest_lines(manifest_path: str, name: str):
+    """
+    Read a join described in a manifest as if it was a single file
+    :param manifest_path: Path of manifest file
+    :param name: Name of the joined file
+    :return: Generator of lines
+    """
+    with open(manifest_path, "r", encoding="utf-8") as in_f:
+        parts = json.load(in_f)[name]["parts"]
+    for part in parts:
+        with open_text(part) as part_f:
+            yield from part_f
+
+
 if __name__ == "__main__":
     args = arguments()
     # args.path_to_aug = ""
     # args.in_file = ""
 
-    aug_files = [
-        f"{args.path_to_aug}/{file}" for file in os.listdir(args.path_to_aug)
-        if os.path.isfile(f"{args.path_to_aug}/{file}")
-    ]
+    aug_files = get_aug_files(args.path_to_aug)
     out_dir = f"{args.path_to_aug}/aug-org-data"
 
     try:
@@ -27,12 +198,20 @@ if __name__ == "__main__":
     except FileExistsError:
         pass
 
-    for aug_f in aug_files:
-        joined_files = []
-        if "augmentation_stats" not in aug_f:
-            with open(args.in_file, "r", encoding="utf-8") as in_file:
-                joined_files.extend(in_file.readlines())
-            with open(aug_f, "r", encoding="utf-8") as aug_file:
-                joined_files.extend(aug_file.readlines())
-            with open(f"{out_dir}/{aug_f.split('/')[-1]}", "w", encoding="utf-8") as out:
-                out.writelines(joined_files)
+    if args.manifest:
+        print(write_manifest(args.in_file, aug_files, out_dir))
+    else:
+        with tempfile.TemporaryDirectory(dir=out_dir, prefix=".original-") as tmp_dir, \
+                ThreadPoolExecutor(max_workers=args.jobs) as executor:
+            futures = []
+            for aug_f in aug_files:
+                out_path = f"{out_dir}/{os.path.basename(aug_f)}"
+                if args.shuffle:
+                    # Shuffling decodes all parts anyway, so the original doesn't need a compressed copy
+                    futures.append(executor.submit(shuffle_files, [args.in_file, aug_f], out_path, args.seed,
+                                                   args.bucket_size))
+                else:
+                    parts = [get_original(args.in_file, aug_f, tmp_dir), aug_f]
+                    futures.append(executor.submit(join_files, parts, out_path))
+            for future in futures:
+                future.result()
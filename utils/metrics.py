@@ -0,0 +1,138 @@
+import cProfile
+import io
+import pstats
+import time
+import tracemalloc
+from contextlib import contextmanager
+
+
+class Metrics:
+    """
+    Lightweight wall time and counter hooks. Stages and counters accumulate over repeated calls, and metrics of
+    worker processes can be merged into the parent's.
+    """
+
+    def __init__(self):
+        self.timers = {}
+        self.counters = {}
+
+    @contextmanager
+    def stage(self, name: str):
+        """
+        Add wall time of the with-block to the given stage
+        """
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.timers[name] = self.timers.get(name, 0.0) + time.perf_counter() - start
+
+    def add_time(self, name: str, seconds: float):
+        self.timers[name] = self.timers.get(name, 0.0) + seconds
+
+    def count(self, name: str, n: int = 1):
+        self.counters[name] = self.counters.get(name, 0) + n
+
+    def merge(self, metrics: dict):
+        """
+        :param metrics: Dictionary as returned by to_dict
+        """
+        for name, seconds in metrics["timers"].items():
+            self.add_time(name, seconds)
+        for name, n in metrics["counters"].items():
+            self.count(name, n)
+
+    def to_dict(self):
+        return {"timers": dict(self.timers), "counters": dict(self.counters)}
+
+
+class Profiler:
+    """
+    cProfile profiles of named parts of a run, e.g. of each strategy of a fused pass, plus the allocation sites of the
+    whole run. Only one profile is active at a time: entering a part pauses the enclosing one, so time spent in a part
+    isn't attributed to the rest of the run as well.
+    """
+
+    def __init__(self):
+        self.profiles = {}
+        self.stack = []  # Names of entered parts, innermost last
+        self.run_name = None
+        self.snapshot = None
+        self.peak = 0
+
+    @contextmanager
+    def part(self, name: str):
+        """
+        Profile the with-block as the given part. Parts entered repeatedly accumulate
+        """
+        if self.stack:
+            self.profiles[self.stack[-1]].disable()
+        profiler = self.profiles.setdefault(name, cProfile.Profile())
+        self.stack.append(name)
+        profiler.enable()
+        try:
+            yield
+        finally:
+            profiler.disable()
+            self.stack.pop()
+            if self.stack:
+                self.profiles[self.stack[-1]].enable()
+
+    @contextmanager
+    def run(self, name: str = "total"):
+        """
+        Trace memory allocations of the with-block and profile it as the given part, except for nested parts
+        """
+        self.run_name = name
+        tracing = tracemalloc.is_tracing()
+        if not tracing:
+            tracemalloc.start()
+        try:
+            with self.part(name):
+                yield self
+        finally:
+            self.snapshot = tracemalloc.take_snapshot()
+            _, self.peak = tracemalloc.get_traced_memory()
+            if not tracing:
+                tracemalloc.stop()
+
+    def dump(self, output_prefixes: dict, n_lines: int = 30):
+        """
+        Write {output_prefix}.prof (loadable with pstats or snakeviz) and {output_prefix}.txt with the top functions
+        by cumulative time of each part. The summary of the run also lists the top allocation sites.
+        :param output_prefixes: Path prefix of the output files of each part. Parts which never ran are skipped
+        :param n_lines: Number of functions and allocation sites listed in the summaries
+        """
+        for name, output_prefix in output_prefixes.items():
+            profiler = self.profiles.get(name)
+            if profiler is None:
+                continue
+            profiler.dump_stats(f"{output_prefix}.prof")
+            summary = io.StringIO()
+            pstats.Stats(profiler, stream=summary).sort_stats("cumulative").print_stats(n_lines)
+            if name == self.run_name and self.snapshot is not None:
+                summary.write(f"\nPeak traced memory: {self.peak / (1 << 20):.1f} MB\nTop allocation sites:\n")
+                for statistic in self.snapshot.statistics("lineno")[:n_lines]:
+                    summary.write(f"{statistic}\n")
+            with open(f"{output_prefix}.txt", "w", encoding="utf-8") as out_f:
+                out_f.write(summary.getvalue())
+
+
+@contextmanager
+def profile(output_prefix: str = None, n_lines: int = 30):
+    """
+    Run the with-block under cProfile and tracemalloc and dump the results.
+    Writes {output_prefix}.prof (loadable with pstats or snakeviz) and {output_prefix}.txt with the top functions
+    by cumulative time and the top allocation sites. Does nothing if output_prefix is None.
+    :param output_prefix: Path prefix of the output files
+    :param n_lines: Number of functions and allocation sites listed in the summary
+    """
+    if output_prefix is None:
+        yield
+        return
+    profiler = Profiler()
+    try:
+        with profiler.run():
+            yield
+    finally:
+        profiler.dump({"total": output_prefix}, n_lines=n_lines)
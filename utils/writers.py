@@ -0,0 +1,133 @@
+import gzip
+import json
+from abc import ABC, abstractmethod
+from typing import Iterable, List
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+def open_output(output_path: str, buffer_size: int = 1 << 20):
+    """
+    Open output file for binary writing. Paths ending with ".gz" are gzip-compressed.
+    :param output_path: Path to output file
+    :param buffer_size: Size of write buffer in bytes
+    """
+    if output_path.endswith(".gz"):
+        return gzip.open(output_path, "wb", compresslevel=6)
+    return open(output_path, "wb", buffering=buffer_size)
+
+
+class SequenceWriter(ABC):
+    """
+    Write sequences incrementally, as they are produced. Encoded lines are collected in a buffer and written in
+    large blocks, so throughput is bound by the disk rather than by per-sentence writes.
+    """
+
+    def __init__(self, output_path: str, buffer_size: int = 1 << 20):
+        """
+        :param output_path: Path to output file. Paths ending with ".gz" are gzip-compressed
+        :param buffer_size: Size of write buffer in characters
+        """
+        self.output_path = output_path
+        self.buffer_size = buffer_size
+        self.file = open_output(output_path, buffer_size)
+        self.buffer = []
+        self.buffered = 0
+        self.n_sentences = 0
+        self.n_lines = 0  # Number of lines written so far, to locate errors in the output file
+        self.n_bytes = 0
+
+    @abstractmethod
+    def encode(self, sequence: List[List[str]]):
+        """
+        :param sequence: Sequence as [[tokens], [tags_col_1], ...]
+        :return: Encoded lines of the sequence
+        """
+
+    def write(self, sequence: List[List[str]]):
+        """
+        :param sequence: Sequence as [[tokens], [tags_col_1], ...]
+        """
+        self.write_encoded(self.encode(sequence))
+
+    def write_encoded(self, text: str):
+        """
+        :param text: Lines of one sequence, as returned by encode
+        """
+        self.buffer.append(text)
+        self.buffered += len(text)
+        self.n_sentences += 1
+        self.n_lines += text.count("\n")
+        if self.buffered >= self.buffer_size:
+            self.flush()
+
+    def write_many(self, sequences: Iterable[List[List[str]]]):
+        for sequence in sequences:
+            self.write(sequence)
+
+    def flush(self):
+        if self.buffer:
+            data = "".join(self.buffer).encode("utf-8")
+            self.file.write(data)
+            self.n_bytes += len(data)
+            self.buffer, self.buffered = [], 0
+
+    def close(self):
+        if self.file is not None:
+            self.flush()
+            self.file.close()
+            self.file = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+
+class TsvWriter(SequenceWriter):
+    """
+    Write sequences in CoNLL-style tsv format: one token per line with tab separated columns, sentences separated by
+    an empty line
+    """
+
+    def encode(self, sequence: List[List[str]]):
+        lengths = [len(column) for column in sequence]
+        if len(set(lengths)) > 1:
+            raise ValueError(f"{self.output_path}:{self.n_lines + 1}: sentence {self.n_sentences} has columns of "
+                             f"different lengths {lengths}, starting with tokens {sequence[0][:10]}")
+        if not lengths or not lengths[0]:
+            return ""
+        return "".join(["\t".join(row) + "\n" for row in zip(*sequence)]) + "\n"
+
+
+class JsonLinesWriter(SequenceWriter):
+    """
+    Write sequences as JSON Lines, one object of columns per sentence
+    """
+
+    def __init__(self, output_path: str, columns: List[str] = None, compact: bool = False, buffer_size: int = 1 << 20):
+        """
+        :param output_path: Path to output file. Paths ending with ".gz" are gzip-compressed
+        :param columns: List of keys names. Default: column indices
+        :param compact: Whether to write compact UTF-8 JSON, using orjson if installed. Default: json.dump format
+        :param buffer_size: Size of write buffer in characters
+        """
+        super().__init__(output_path, buffer_size=buffer_size)
+        self.columns = columns
+        self.compact = compact
+
+    def encode(self, sequence: List[List[str]]):
+        if self.columns is not None and len(self.columns) != len(sequence):
+            raise ValueError(f"{self.output_path}:{self.n_lines + 1}: sentence {self.n_sentences} has "
+                             f"{len(sequence)} columns, but {len(self.columns)} column names were given")
+        keys = self.columns if self.columns is not None else [str(i) for i in range(len(sequence))]
+        record = dict(zip(keys, sequence))
+        if not self.compact:
+            return json.dumps(record) + "\n"
+        if orjson is not None:
+            return orjson.dumps(record).decode("utf-8") + "\n"
+        return json.dumps(record, ensure_ascii=False, separators=(",", ":")) + "\n"